@@ -1,6 +1,7 @@
 import pandas as pd
 import os
 import difflib
+from progress import ProgressContext
 #一致性评价进度excel专用代码批量0.4文本相似度批量本地python库筛选
 
 def calculate_text_similarity(text1, text2):
@@ -14,7 +15,7 @@ def remove_last_two_chars(text):
     return text
 
 def process_excel(input_path, output_folder, similarity_threshold=0.4, anchor_column=5, 
-                  compare_column=3, group_column=0, trim_chars=2, output_callback=None):
+                  compare_column=3, group_column=0, trim_chars=2, output_callback=None, progress=None):
     """
     处理Excel文件，根据相似度匹配行
     
@@ -27,7 +28,9 @@ def process_excel(input_path, output_folder, similarity_threshold=0.4, anchor_co
     group_column: 分组列索引，默认0（第1列）
     trim_chars: 去掉末尾字符数，默认2
     output_callback: 输出回调函数，用于GUI界面显示日志
+    progress: 进度/取消上下文（ProgressContext），按已处理的锚点候选行报告进度
     """
+    progress = progress or ProgressContext()
     
     def print_log(message):
         """日志输出函数"""
@@ -53,7 +56,10 @@ def process_excel(input_path, output_folder, similarity_threshold=0.4, anchor_co
     anchor_with_matches = set()
     
     # 遍历每一行（锚点行）
-    for idx, row in df.iterrows():
+    progress.start(len(df), "相似度匹配")
+    for position, (idx, row) in enumerate(df.iterrows()):
+        progress.check()
+        progress.update(position)
         # 检查锚点列是否非空
         if not pd.isna(row[anchor_column]):
             group_value = row[group_column]  # 分组列的值
@@ -97,6 +103,8 @@ def process_excel(input_path, output_folder, similarity_threshold=0.4, anchor_co
                 matched_rows.append(row.tolist())
                 anchor_with_matches.add(idx)
     
+    progress.finish()
+    
     # 统计未找到匹配的锚点行
     all_anchors = [idx for idx, row in df.iterrows() if not pd.isna(row[anchor_column])]
     anchors_without_matches = set(all_anchors) - anchor_with_matches
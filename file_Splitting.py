@@ -1,8 +1,10 @@
 import pandas as pd
 import os
 from pathlib import Path
+from progress import ProgressContext, OperationCancelled
 
-def split_excel_by_column(source_file, split_column, output_columns, output_dir="split_results", output_callback=None):
+def split_excel_by_column(source_file, split_column, output_columns, output_dir="split_results", output_callback=None,
+                          progress=None):
     """
     根据指定列分割Excel文件为多个文件
     
@@ -12,6 +14,7 @@ def split_excel_by_column(source_file, split_column, output_columns, output_dir=
         output_columns (list): 要输出的列组合列表，每个组合是一个列序号列表（从1开始数起）
         output_dir (str): 输出目录路径，默认为"split_results"
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        progress (ProgressContext): 进度/取消上下文，按已处理的唯一值报告进度
         
     Returns:
         bool: 分割是否成功
@@ -23,6 +26,7 @@ def split_excel_by_column(source_file, split_column, output_columns, output_dir=
         else:
             print(msg)
     
+    progress = progress or ProgressContext()
     try:
         # 检查源文件是否存在
         if not os.path.exists(source_file):
@@ -45,9 +49,12 @@ def split_excel_by_column(source_file, split_column, output_columns, output_dir=
         unique_values = df.iloc[:, split_col_index].dropna().unique()
         
         _print(f"根据列 '{df.columns[split_col_index]}' 分割，共有 {len(unique_values)} 个唯一值")
+        progress.start(len(unique_values), "拆分文件")
         
         # 为每个唯一值创建一个文件
         for i, value in enumerate(unique_values):
+            progress.check()
+            progress.update(i)
             # 筛选数据
             filtered_df = df[df.iloc[:, split_col_index] == value]
             
@@ -88,9 +95,12 @@ def split_excel_by_column(source_file, split_column, output_columns, output_dir=
                     selected_df.to_excel(filepath, index=False)
                     _print(f"已保存: {filepath}")
         
+        progress.finish()
         _print(f"分割完成，结果保存在目录: {output_dir}")
         return True
         
+    except OperationCancelled:
+        raise
     except Exception as e:
         _print(f"分割文件时出错: {str(e)}")
         return False
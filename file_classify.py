@@ -11,11 +11,68 @@ classify_files("/path/to/source", "/path/to/target", ["word", "excel", "pdf"])
 """
 
 import os
+import sys
+import json
+import errno
+import sqlite3
+import hashlib
 import shutil
 import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
 from pathlib import Path
 import re
-from collections import defaultdict
+from progress import ProgressContext
+
+# 可选依赖：安装了 watchdog 时监视模式通过文件系统事件（Linux 上为 inotify）触发扫描，否则定时轮询
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# 可选依赖：安装了 pyahocorasick 时关键词匹配使用其 C 实现的自动机，否则使用纯 Python 实现
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 并行复制的线程数（网络共享盘上复制主要受延迟限制，适当并发可显著提速）
+COPY_WORKERS = 8
+
+# 监视模式下的轮询间隔（秒），以及文件大小和修改时间保持不变多久才视为写入完成
+WATCH_POLL_INTERVAL = 1.0
+WATCH_SETTLE_SECONDS = 2.0
+# 轮询模式下每隔多少秒对全部文件做一次完整检查（发现所在目录修改时间没有变化的原地修改）
+WATCH_FULL_SCAN_SECONDS = 60.0
+
+# 提交队列上限为线程数的倍数，超过时遍历暂停，等待复制跟上
+SUBMIT_QUEUE_FACTOR = 4
+
+# 去重时部分哈希读取文件首尾各多少字节
+DEDUP_PARTIAL_BYTES = 64 * 1024
+
+# 内核态复制每次调用的最大字节数
+COPY_CHUNK_SIZE = 1 << 30
+
+# 内核态复制不可用时（跨文件系统、文件系统不支持等）回退到普通复制的错误码
+_KERNEL_COPY_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP,
+                                getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP), errno.EBADF}
+
+# 文件传输方式及其日志用语
+# copy: 复制；move: 同一设备上直接重命名，跨设备时复制后删除源文件；
+# hardlink: 硬链接，不复制数据；reflink: 写时复制克隆（btrfs/xfs 等），不支持时退化为复制
+TRANSFER_MODES = {
+    'copy': '已复制',
+    'move': '已移动',
+    'hardlink': '已硬链接',
+    'reflink': '已克隆',
+}
+
+# Linux FICLONE ioctl 请求号，即 _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
 
 # 定义文件类型和对应文件夹的映射关系
 FILE_TYPES = {
@@ -55,6 +112,27 @@ NAME_PATTERNS = {
     'report': r'(?i)report'       # 匹配"report"，不区分大小写
 }
 
+# 自定义文件名模式配置文件（JSON，格式为 {"pattern_name": "regex_pattern"}），与 NAME_PATTERNS 合并
+NAME_PATTERNS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_patterns.json')
+
+def load_name_patterns(config_path=None):
+    """
+    获取可用的文件名模式：内置的 NAME_PATTERNS 加上配置文件中的自定义模式（同名时自定义优先）
+    config_path 为 None 时读取 NAME_PATTERNS_CONFIG（文件不存在则只返回内置模式）
+    """
+    name_patterns = dict(NAME_PATTERNS)
+    if config_path is None:
+        if not os.path.exists(NAME_PATTERNS_CONFIG):
+            return name_patterns
+        config_path = NAME_PATTERNS_CONFIG
+    with open(config_path, 'r', encoding='utf-8') as f:
+        custom_patterns = json.load(f)
+    if not isinstance(custom_patterns, dict):
+        raise ValueError(f"文件名模式配置文件 {config_path} 的内容应为 {{\"模式名\": \"正则表达式\"}} 格式")
+    for pattern_name, pattern in custom_patterns.items():
+        name_patterns[str(pattern_name)] = str(pattern)
+    return name_patterns
+
 def create_folders(base_path, selected_types=None, sub_types=None, name_patterns=None, keywords=None):
     """创建所有需要的文件夹"""
     # 创建主类型文件夹
@@ -85,67 +163,902 @@ def create_folders(base_path, selected_types=None, sub_types=None, name_patterns
             folder_path = os.path.join(base_path, 'keyword', keyword)
             os.makedirs(folder_path, exist_ok=True)
 
+# 扩展名 -> 文件类型、(主类型, 扩展名) -> 子类型的查找表（同一扩展名出现多次时以先定义的为准，与逐个扫描的结果一致）
+_EXTENSION_TYPES = {}
+for _file_type, _extensions in FILE_TYPES.items():
+    for _extension in _extensions:
+        _EXTENSION_TYPES.setdefault(_extension, _file_type)
+_SUB_EXTENSION_TYPES = {}
+for _main_type, _sub_type_dict in SUB_TYPES.items():
+    for _sub_type_name, _extensions in _sub_type_dict.items():
+        for _extension in _extensions:
+            _SUB_EXTENSION_TYPES.setdefault((_main_type, _extension), _sub_type_name)
+
+# 已知扩展名最多包含的段数（如 nii.gz 为 2 段）
+_MAX_EXTENSION_PARTS = max(extension.count('.') + 1 for extension in _EXTENSION_TYPES)
+
+def get_file_extension(filename):
+    """
+    获取文件扩展名（小写，不含点号），支持 nii.gz 这样的多段扩展名
+    优先返回最长的已知扩展名，都不认识时返回最后一段
+    """
+    # 以点号开头的隐藏文件（如 .bashrc）与 Path.suffix 一致，视为没有扩展名
+    parts = filename.lower().lstrip('.').split('.')[1:]
+    if not parts:
+        return ''
+    for count in range(min(_MAX_EXTENSION_PARTS, len(parts)), 1, -1):
+        extension = '.'.join(parts[-count:])
+        if extension in _EXTENSION_TYPES:
+            return extension
+    return parts[-1]
+
 def get_file_type(extension):
     """根据文件扩展名获取文件类型"""
-    extension = extension.lower().lstrip('.')
-    
-    for file_type, extensions in FILE_TYPES.items():
-        if extension in extensions:
-            return file_type
-    
-    return 'other'  # 未识别的文件类型
+    return _EXTENSION_TYPES.get(extension.lower().lstrip('.'), 'other')  # 未识别的文件类型归为 other
 
 def get_sub_file_type(extension, main_type):
     """根据文件扩展名获取子文件类型"""
-    extension = extension.lower().lstrip('.')
-    
-    if main_type in SUB_TYPES:
-        for sub_type_name, extensions in SUB_TYPES[main_type].items():
-            if extension in extensions:
-                return sub_type_name
-    
+    return _SUB_EXTENSION_TYPES.get((main_type, extension.lower().lstrip('.')))
+
+# 文件头识别读取的字节数
+SNIFF_BYTES = 8192
+
+# 文件类型识别缓存（位于目标目录，以 inode、大小、修改时间为键）
+FILE_TYPE_CACHE_FILENAME = "文件类型识别缓存.sqlite"
+
+# 增量分类清单（位于目标目录，记录已分类文件的源路径、大小、修改时间和目标路径）
+CLASSIFY_MANIFEST_FILENAME = "分类清单.sqlite"
+
+# 分类工具写在目标目录中的索引文件（含 SQLite 日志文件），遍历源目录时跳过
+_INDEX_FILENAMES = (FILE_TYPE_CACHE_FILENAME, CLASSIFY_MANIFEST_FILENAME)
+
+# 文件头特征：(偏移, 特征字节, 对应扩展名)
+_MAGIC_SIGNATURES = [
+    (0, b'%PDF-', 'pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'png'),
+    (0, b'\xff\xd8\xff', 'jpg'),
+    (0, b'GIF87a', 'gif'),
+    (0, b'GIF89a', 'gif'),
+    (0, b'II*\x00', 'tiff'),
+    (0, b'MM\x00*', 'tiff'),
+    (0, b'Rar!\x1a\x07', 'rar'),
+    (0, b"7z\xbc\xaf'\x1c", '7z'),
+    (0, b'\x1f\x8b', 'gz'),
+    (0, b'ID3', 'mp3'),
+    (0, b'fLaC', 'flac'),
+    (0, b'OggS', 'ogg'),
+    (0, b'\x1aE\xdf\xa3', 'mkv'),
+    (4, b'ftyp', 'mp4'),
+    (8, b'WAVE', 'wav'),
+    (8, b'AVI ', 'avi'),
+]
+
+# Office Open XML 压缩包内部目录对应的扩展名
+_OOXML_MARKERS = [(b'word/', 'docx'), (b'xl/', 'xlsx'), (b'ppt/', 'pptx')]
+
+def sniff_file_extension(file_path):
+    """
+    根据文件头（一次 os.read 读取前 SNIFF_BYTES 字节）推断文件的真实扩展名，无法识别时返回 None
+    doc/xls/ppt 共用的 OLE 复合文档格式无法区分，也返回 None
+    """
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        head = os.read(fd, SNIFF_BYTES)
+    finally:
+        os.close(fd)
+    if not head:
+        return None
+    for offset, magic, extension in _MAGIC_SIGNATURES:
+        if head.startswith(magic, offset):
+            return extension
+    if head.startswith(b'PK\x03\x04'):
+        for marker, extension in _OOXML_MARKERS:
+            if marker in head:
+                return extension
+        return 'zip'
+    # 没有 NUL 字节且能按 UTF-8 解码的视为文本（末尾可能截断半个字符）
+    if b'\x00' not in head:
+        try:
+            head.decode('utf-8')
+            return 'txt'
+        except UnicodeDecodeError as e:
+            if e.start >= len(head) - 3:
+                return 'txt'
     return None
 
-def move_file(file_path, destination_folder, output_callback=None):
-    """移动文件到目标文件夹"""
+class FileTypeDetector:
+    """
+    文件类型识别器
+
+    默认只按扩展名查表识别。开启 sniff_content 后还会读取文件头：
+    扩展名缺失或不认识时按文件头识别；扩展名已知但文件头明确是另一种格式（如改名为 .txt 的 PDF）时以文件头为准。
+    压缩包和纯文本的识别结果不会覆盖已知扩展名（docx/xlsx/nii.gz 等本身就是 zip/gzip 格式）。
+    识别结果按 (绝对路径, 设备号, inode, 大小, 修改时间) 缓存到 cache_folder 下的 SQLite 文件中，重复运行时跳过读取文件头；
+    inode 只在同一文件系统内唯一，源目录跨多个挂载点时由路径和设备号区分。
+    """
+
+    def __init__(self, sniff_content=False, cache_folder=None):
+        self.sniff_content = sniff_content
+        self._connection = None
+        self._pending = []
+        if sniff_content and cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(cache_folder, FILE_TYPE_CACHE_FILENAME))
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sniffed ("
+                "path TEXT, device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, extension TEXT, "
+                "PRIMARY KEY (path, device, inode, size, mtime_ns))"
+            )
+
+    def _sniffed_extension(self, file_path):
+        """读取（或从缓存获取）文件头识别出的扩展名，空字符串表示无法识别"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if self._connection is not None:
+            row = self._connection.execute(
+                "SELECT extension FROM sniffed WHERE path = ? AND device = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+                key
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        try:
+            extension = sniff_file_extension(file_path) or ''
+        except OSError:
+            return ''
+        if self._connection is not None:
+            self._pending.append(key + (extension,))
+            if len(self._pending) >= 500:
+                self.flush()
+        return extension
+
+    def detect(self, file_path):
+        """返回 (文件类型, 扩展名)"""
+        extension = get_file_extension(file_path.name)
+        if not self.sniff_content:
+            return get_file_type(extension), extension
+        sniffed = self._sniffed_extension(file_path)
+        if sniffed and (extension not in _EXTENSION_TYPES or _EXTENSION_TYPES[sniffed] not in ('archive', 'text')):
+            extension = sniffed
+        return get_file_type(extension), extension
+
+    def flush(self):
+        """写入尚未保存的识别结果"""
+        if self._connection is not None and self._pending:
+            self._connection.executemany("INSERT OR REPLACE INTO sniffed VALUES (?, ?, ?, ?, ?, ?)", self._pending)
+            self._connection.commit()
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def _sendfile(in_fd, out_fd, count):
+    """os.sendfile 的包装，参数顺序与 os.copy_file_range 保持一致"""
+    return os.sendfile(out_fd, in_fd, None, count)
+
+def _fast_copy(source_path, destination_path):
+    """
+    复制文件内容和权限位（等同 shutil.copy）
+    Linux 下优先使用内核态的 copy_file_range / sendfile，数据不经过用户态缓冲区；
+    文件系统不支持时回退到普通复制
+    """
+    with open(source_path, 'rb') as fsrc, open(destination_path, 'wb') as fdst:
+        copied = False
+        if sys.platform.startswith('linux'):
+            in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+            for kernel_copy in (getattr(os, 'copy_file_range', None), _sendfile):
+                if kernel_copy is None:
+                    continue
+                total = 0
+                try:
+                    while True:
+                        sent = kernel_copy(in_fd, out_fd, COPY_CHUNK_SIZE)
+                        if sent == 0:
+                            break
+                        total += sent
+                    copied = True
+                    break
+                except OSError as e:
+                    # 已经写入部分数据时不能再换方式续写
+                    if total or e.errno not in _KERNEL_COPY_FALLBACK_ERRNOS:
+                        raise
+        if not copied:
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copymode(source_path, destination_path)
+
+def _reflink(source_path, destination_path):
+    """写时复制克隆文件，返回 False 表示当前平台或文件系统不支持"""
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
     try:
-        # 确保目标文件夹存在
-        os.makedirs(destination_folder, exist_ok=True)
-        
-        # 构造目标文件路径
-        destination_path = os.path.join(destination_folder, file_path.name)
-        
-        # 如果目标文件已存在，添加序号
-        counter = 1
-        while os.path.exists(destination_path):
-            name, ext = os.path.splitext(file_path.name)
-            destination_path = os.path.join(destination_folder, f"{name}_{counter}{ext}")
-            counter += 1
-            # 防止无限循环
-            if counter > 1000:
-                error_msg = f"无法移动文件 {file_path}: 目标文件名冲突过多"
-                if output_callback:
-                    output_callback(error_msg)
-                else:
-                    print(error_msg)
-                return False, None
-        
-        shutil.copy(str(file_path), destination_path)
-        success_msg = f"已移动: {file_path} -> {destination_path}"
-        if output_callback:
-            output_callback(success_msg)
+        with open(source_path, 'rb') as fsrc, open(destination_path, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    except OSError as e:
+        if e.errno not in _KERNEL_COPY_FALLBACK_ERRNOS | {errno.ENOTTY}:
+            raise
+        return False
+    shutil.copymode(source_path, destination_path)
+    return True
+
+def _transfer(source_path, destination_path, transfer_mode='copy'):
+    """
+    按传输方式把源文件放到目标路径（目标路径是 DestinationRegistry 创建的空占位文件）
+    返回实际使用的传输方式（硬链接/克隆不可用时会退化为 copy）
+    """
+    if transfer_mode == 'move':
+        # 同一设备上 rename 只修改元数据；跨设备时复制后删除源文件
+        if os.stat(source_path).st_dev == os.stat(os.path.dirname(destination_path)).st_dev:
+            try:
+                os.replace(source_path, destination_path)
+                return 'move'
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        _fast_copy(source_path, destination_path)
+        shutil.copystat(source_path, destination_path)
+        os.remove(source_path)
+        return 'move'
+    if transfer_mode == 'hardlink':
+        # os.link 不能覆盖已有文件：先链接到同目录下的临时名，再用 os.replace 原子地替换占位文件，
+        # 占位文件在整个过程中一直存在，其他进程不会在中途占用这个文件名
+        link_path = os.path.join(os.path.dirname(destination_path),
+                                 f".{os.path.basename(destination_path)}.{uuid.uuid4().hex}.link")
+        try:
+            os.link(source_path, link_path)
+        except OSError as e:
+            # 跨设备或文件系统不支持硬链接时退化为复制
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+                raise
         else:
-            print(success_msg)
-        return True, destination_path
+            try:
+                os.replace(link_path, destination_path)
+            except OSError:
+                os.remove(link_path)
+                raise
+            return 'hardlink'
+    elif transfer_mode == 'reflink':
+        if _reflink(source_path, destination_path):
+            return 'reflink'
+    _fast_copy(source_path, destination_path)
+    return 'copy'
+
+class DestinationRegistry:
+    """
+    目标文件夹文件名登记表
+
+    每个目标文件夹第一次使用时创建目录并用一次 os.scandir 读入已有文件名，
+    之后的冲突检测和序号分配（name_1、name_2……）都在内存中完成，并记住每个文件名下一个可用序号，
+    不再对每个候选名调用 os.path.exists。分配出的路径以 O_EXCL 创建空占位文件，
+    即使有其他进程同时写入同一文件夹也不会覆盖已有文件。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._folders = {}
+
+    def _folder_state(self, destination_folder):
+        """返回 (文件夹锁, 已占用文件名集合, 下一个序号字典)，首次访问时扫描文件夹"""
+        with self._lock:
+            state = self._folders.get(destination_folder)
+            if state is None:
+                os.makedirs(destination_folder, exist_ok=True)
+                with os.scandir(destination_folder) as it:
+                    names = {os.path.normcase(entry.name) for entry in it}
+                state = (threading.Lock(), names, {})
+                self._folders[destination_folder] = state
+            return state
+
+    def claim(self, file_name, destination_folder):
+        """分配一个不冲突的目标路径并创建占位文件"""
+        folder_lock, names, counters = self._folder_state(destination_folder)
+        name, ext = os.path.splitext(file_name)
+        with folder_lock:
+            candidate = file_name
+            counter = counters.get(file_name, 1)
+            while True:
+                key = os.path.normcase(candidate)
+                if key not in names:
+                    destination_path = os.path.join(destination_folder, candidate)
+                    try:
+                        fd = os.open(destination_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    except FileExistsError:
+                        # 扫描之后被其他进程创建的文件
+                        names.add(key)
+                        continue
+                    os.close(fd)
+                    names.add(key)
+                    if candidate != file_name:
+                        counters[file_name] = counter
+                    return destination_path
+                candidate = f"{name}_{counter}{ext}"
+                counter += 1
+
+    def discard(self, destination_path):
+        """删除未能写入的占位文件；文件名保持占用，避免与并发分配冲突"""
+        try:
+            os.remove(destination_path)
+        except OSError:
+            pass
+
+def move_file(file_path, destination_folder, output_callback=None, registry=None, transfer_mode='copy'):
+    """
+    按传输方式（见 TRANSFER_MODES）把文件放到目标文件夹
+    registry 为 DestinationRegistry，批量处理时应共用同一个登记表
+    """
+    if registry is None:
+        registry = DestinationRegistry()
+    destination_path = None
+    try:
+        # 分配目标文件路径（确保目标文件夹存在，如果目标文件已存在，添加序号）
+        destination_path = registry.claim(file_path.name, destination_folder)
+        
+        applied_mode = _transfer(str(file_path), destination_path, transfer_mode)
     except Exception as e:
+        # 删除已创建的占位文件
+        if destination_path is not None:
+            registry.discard(destination_path)
         error_msg = f"移动文件失败 {file_path}: {str(e)}"
         if output_callback:
             output_callback(error_msg)
         else:
             print(error_msg)
         return False, None
+    
+    success_msg = f"{TRANSFER_MODES[applied_mode]}: {file_path} -> {destination_path}"
+    if output_callback:
+        output_callback(success_msg)
+    else:
+        print(success_msg)
+    return True, destination_path
+
+class CopyScheduler:
+    """
+    并行复制调度器
+
+    使用有界线程池并发执行 move_file；所有任务共用一个 DestinationRegistry，
+    同一目标文件夹内的文件名在该文件夹的锁内分配，两个线程不会选中同一个文件名。
+    提交队列有上限（SUBMIT_QUEUE_FACTOR 倍线程数），队列满时 submit 会阻塞，
+    因此边遍历边分类时内存占用不随文件数增长。
+    每提交一个文件把 progress（ProgressContext）的总量加一，每完成一个文件报告一次进度，
+    因此边遍历边分类时百分比为已完成数占已提交数的比例。
+    """
+
+    def __init__(self, output_callback=None, progress=None, max_workers=COPY_WORKERS, transfer_mode='copy',
+                 on_transferred=None):
+        if transfer_mode not in TRANSFER_MODES:
+            raise ValueError(f"不支持的传输方式: {transfer_mode}，可选: {', '.join(TRANSFER_MODES)}")
+        self.transfer_mode = transfer_mode
+        self.output_callback = output_callback or self._print
+        self._print_lock = threading.Lock()
+        self.progress = progress if progress is not None else ProgressContext()
+        # 每个文件传输成功后在工作线程中调用 on_transferred(file_path, destination_path)
+        self.on_transferred = on_transferred
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers * SUBMIT_QUEUE_FACTOR)
+        self._lock = threading.Lock()
+        self.registry = DestinationRegistry()
+        self.moved_count = 0
+
+    def _print(self, message):
+        """命令行模式下加锁输出，避免多个线程的日志行交错"""
+        with self._print_lock:
+            print(message)
+
+    def submit(self, file_path, destination_folder):
+        """提交一个复制任务（队列已满时阻塞等待）"""
+        self._slots.acquire()
+        self.progress.add_total(1)
+        future = self._executor.submit(self._run, file_path, destination_folder)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, file_path, destination_folder):
+        success, destination_path = move_file(file_path, destination_folder, self.output_callback, registry=self.registry,
+                                             transfer_mode=self.transfer_mode)
+        if success and self.on_transferred:
+            self.on_transferred(file_path, destination_path)
+        if success:
+            with self._lock:
+                self.moved_count += 1
+        self.progress.advance(1)
+        return success, destination_path
+
+    def wait(self):
+        """等待所有任务完成并关闭线程池，返回成功复制的文件数"""
+        self._executor.shutdown(wait=True)
+        return self.moved_count
+
+def _matches_any(name, relative_path, patterns):
+    """文件名或相对路径是否匹配任一 glob 模式"""
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern) for pattern in patterns)
+
+def iter_source_files(source_path, recursive=False, include=None, exclude=None, max_depth=None, skip_dir=None):
+    """
+    基于 os.scandir 的文件遍历生成器，逐个产出待分类文件的 Path
+
+    直接使用 DirEntry 缓存的类型信息判断文件/目录，不再对每个条目额外 stat；
+    子目录按深度优先依次扫描，任一时刻只保留待扫描目录的路径，遍历与分类可以同时进行。
+
+    Args:
+        source_path (str): 源目录路径
+        recursive (bool): 是否遍历子目录
+        include (list): 只处理匹配这些 glob 模式的文件（匹配文件名或相对路径），None 表示全部
+        exclude (list): 跳过匹配这些 glob 模式的文件和目录
+        max_depth (int): 递归时的最大子目录深度，0 表示只处理顶层，None 表示不限
+        skip_dir (function): 目录路径判断函数，返回 True 的目录不进入（用于跳过分类输出目录）
+    """
+    # 栈中保存 (目录路径, 相对路径前缀, 深度)
+    stack = [(source_path, '', 0)]
+    while stack:
+        scanned = _scan_directory(*stack.pop(), recursive, include, exclude, max_depth, skip_dir)
+        if scanned is None:
+            continue
+        files, sub_directories = scanned
+        yield from files
+        # 逆序入栈，保证按目录内的顺序依次遍历
+        stack.extend(reversed(sub_directories))
+
+def _scan_directory(directory, prefix, depth, recursive, include, exclude, max_depth, skip_dir):
+    """
+    扫描单个目录（参数含义同 iter_source_files），返回 (文件 Path 列表, 子目录 [(路径, 相对路径前缀, 深度)])，
+    目录无法读取时返回 None
+    """
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        return None
+    files = []
+    sub_directories = []
+    for entry in entries:
+        relative_path = prefix + entry.name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if not recursive or (max_depth is not None and depth >= max_depth):
+                    continue
+                if exclude and _matches_any(entry.name, relative_path, exclude):
+                    continue
+                if skip_dir and skip_dir(entry.path):
+                    continue
+                sub_directories.append((entry.path, relative_path + '/', depth + 1))
+                continue
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+        if include and not _matches_any(entry.name, relative_path, include):
+            continue
+        if exclude and _matches_any(entry.name, relative_path, exclude):
+            continue
+        files.append(Path(entry.path))
+    return files, sub_directories
+
+class ClassifyManifest:
+    """
+    增量分类清单
+
+    在目标目录的 SQLite 文件中记录每个已分类源文件的绝对路径、大小、修改时间和目标路径。
+    增量运行时源文件大小和修改时间都没变、且上次的目标文件仍然存在的文件直接跳过，
+    只处理新增或修改过的文件。传输结果由复制线程登记，在遍历线程中批量写入数据库。
+    """
+
+    def __init__(self, target_path):
+        os.makedirs(target_path, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(target_path, CLASSIFY_MANIFEST_FILENAME))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            "source_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, destination TEXT)"
+        )
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._pending = []
+
+    def is_unchanged(self, file_path):
+        """源文件自上次分类后是否没有变化（同时记下本次的大小和修改时间，供传输成功后登记）"""
+        source_path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return False
+        row = self._connection.execute(
+            "SELECT size, mtime_ns, destination FROM manifest WHERE source_path = ?", (source_path,)
+        ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and os.path.exists(row[2]):
+            return True
+        with self._lock:
+            self._stats[source_path] = (stat.st_size, stat.st_mtime_ns)
+        return False
+
+    def record(self, file_path, destination_path):
+        """登记传输成功的文件（可在复制线程中调用）"""
+        source_path = os.path.abspath(file_path)
+        with self._lock:
+            stat = self._stats.pop(source_path, None)
+            if stat is not None:
+                self._pending.append((source_path, stat[0], stat[1], destination_path))
+
+    def flush(self):
+        """把已登记的结果写入数据库（只在创建清单的线程中调用）"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if rows:
+            self._connection.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?)", rows)
+            self._connection.commit()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+def _partial_hash(file_path, size):
+    """文件首尾各 DEDUP_PARTIAL_BYTES 字节的 BLAKE2 哈希（小文件即为全文哈希）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        if size <= 2 * DEDUP_PARTIAL_BYTES:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(DEDUP_PARTIAL_BYTES))
+            f.seek(-DEDUP_PARTIAL_BYTES, os.SEEK_END)
+            digest.update(f.read(DEDUP_PARTIAL_BYTES))
+    return digest.digest()
+
+def _full_hash(file_path):
+    """文件全文的 BLAKE2 哈希"""
+    digest = hashlib.blake2b()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+def _map_with_progress(executor, func, items, progress, stage):
+    """
+    在线程池中对 items 逐个执行 func 并按顺序返回结果列表，每得到一个结果检查取消并报告进度
+    请求取消时丢弃尚未开始的任务后抛出 OperationCancelled
+    """
+    if progress is None:
+        return list(executor.map(func, items))
+    progress.start(len(items), stage)
+    results = []
+    try:
+        for result in executor.map(func, items):
+            progress.check()
+            results.append(result)
+            progress.advance(1)
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    return results
+
+def find_duplicate_files(file_paths, max_workers=COPY_WORKERS, progress=None):
+    """
+    查找内容重复的文件，返回 {重复文件: 首个相同内容的文件}
+
+    先按文件大小分组，只有大小相同的文件才读取首尾各 64 KB 计算部分哈希，
+    部分哈希仍相同且文件大于 128 KB 时再计算全文 BLAKE2 哈希；读取和哈希在线程池中并行执行。
+    每组内容相同的文件中保留 file_paths 顺序里最靠前的一个。
+    progress 为 ProgressContext 时按 读取文件大小/部分哈希/全文哈希 三个阶段报告进度，
+    每得到一个结果检查一次是否已请求取消。
+    """
+    file_paths = list(file_paths)
+
+    def safe(func):
+        def wrapper(*args):
+            try:
+                return func(*args)
+            except OSError:
+                return None
+        return wrapper
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        sizes = _map_with_progress(executor, safe(lambda path: os.stat(path).st_size), file_paths, progress,
+                                   "读取文件大小")
+        size_groups = {}
+        for index, size in enumerate(sizes):
+            if size is not None:
+                size_groups.setdefault(size, []).append(index)
+        candidates = [index for group in size_groups.values() if len(group) > 1 for index in group]
+
+        # 按 (大小, 部分哈希) 分组
+        partial_hashes = _map_with_progress(executor, safe(lambda index: _partial_hash(file_paths[index], sizes[index])),
+                                            candidates, progress, "计算部分哈希")
+        partial_groups = {}
+        for index, partial in zip(candidates, partial_hashes):
+            if partial is not None:
+                partial_groups.setdefault((sizes[index], partial), []).append(index)
+
+        # 部分哈希已覆盖全文的小文件直接按部分哈希判定，大文件再比较全文哈希
+        content_groups = []
+        full_candidates = []
+        for (size, _), group in partial_groups.items():
+            if len(group) < 2:
+                continue
+            if size <= 2 * DEDUP_PARTIAL_BYTES:
+                content_groups.append(group)
+            else:
+                full_candidates.extend(group)
+        full_hashes = _map_with_progress(executor, safe(lambda index: _full_hash(file_paths[index])), full_candidates,
+                                         progress, "计算全文哈希")
+        full_groups = {}
+        for index, full in zip(full_candidates, full_hashes):
+            if full is not None:
+                full_groups.setdefault((sizes[index], full), []).append(index)
+        content_groups.extend(group for group in full_groups.values() if len(group) > 1)
+
+    duplicates = {}
+    for group in content_groups:
+        group.sort()
+        for index in group[1:]:
+            duplicates[file_paths[index]] = file_paths[group[0]]
+    return duplicates
+
+def _output_dir_filter(source_path, target_path, output_names=None):
+    """
+    返回递归遍历时跳过分类输出目录的判断函数
+    目标目录位于源目录内部时整个跳过；目标目录与源目录相同时只跳过顶层的分类输出文件夹
+    output_names 为输出文件夹名集合，或对文件夹名返回 True/False 的函数
+    """
+    source_real = os.path.realpath(source_path)
+    target_real = os.path.realpath(target_path)
+
+    def skip_dir(path):
+        path_real = os.path.realpath(path)
+        if target_real != source_real:
+            return path_real == target_real
+        if os.path.dirname(path_real) != target_real or output_names is None:
+            return False
+        name = os.path.basename(path_real)
+        return output_names(name) if callable(output_names) else name in output_names
+
+    return skip_dir
+
+def _classify_stream(source_path, target_path, get_destinations, output_callback, progress, max_workers,
+                     transfer_mode, walk_options, output_names=None, dedup=False, incremental=False):
+    """
+    遍历源目录并把每个文件按 get_destinations 返回的目标文件夹列表提交给 CopyScheduler
+    progress 为 ProgressContext，每个文件处理前检查是否已请求取消
+    dedup 为 True 时先遍历完整个目录找出内容重复的文件，每份内容只传输一次（遍历和哈希过程中同样检查取消）
+    incremental 为 True 时使用目标目录中的分类清单，跳过上次分类后没有变化的文件
+    返回 (处理的文件数, 成功传输的文件数, 用到的目标文件夹集合)
+    """
+    skip_dir = _output_dir_filter(source_path, target_path, output_names)
+    target_real = os.path.realpath(target_path)
+    # 跳过分类工具自己写在目标目录中的索引文件
+    source_files = (
+        file_path for file_path in iter_source_files(source_path, skip_dir=skip_dir, **walk_options)
+        if not (file_path.name.startswith(_INDEX_FILENAMES) and os.path.realpath(file_path.parent) == target_real)
+    )
+    
+    duplicates = {}
+    if dedup:
+        collected = []
+        for file_path in source_files:
+            progress.check()
+            collected.append(file_path)
+        source_files = collected
+        duplicates = find_duplicate_files(source_files, max_workers, progress)
+        if duplicates:
+            message = f"发现 {len(duplicates)} 个内容重复的文件，将只传输每份内容的第一个文件"
+            if output_callback:
+                output_callback(message)
+            else:
+                print(message)
+    
+    manifest = ClassifyManifest(target_path) if incremental else None
+    progress.start(0, "分类文件")
+    scheduler = CopyScheduler(output_callback, progress, max_workers, transfer_mode,
+                              on_transferred=manifest.record if manifest else None)
+    destination_folders = set()
+    total_files = 0
+    unchanged_count = 0
+    try:
+        for file_path in source_files:
+            progress.check()
+            total_files += 1
+            if file_path in duplicates:
+                scheduler.output_callback(f"跳过重复文件: {file_path}（与 {duplicates[file_path]} 内容相同）")
+                continue
+            if manifest is not None:
+                if manifest.is_unchanged(file_path):
+                    unchanged_count += 1
+                    continue
+                if total_files % 500 == 0:
+                    manifest.flush()
+            for destination_folder in get_destinations(file_path):
+                destination_folders.add(destination_folder)
+                scheduler.submit(file_path, destination_folder)
+    finally:
+        moved_files_count = scheduler.wait()
+        if manifest is not None:
+            manifest.close()
+    progress.finish()
+    if manifest is not None:
+        scheduler.output_callback(f"增量模式: 跳过 {unchanged_count} 个上次分类后没有变化的文件")
+    return total_files, moved_files_count, destination_folders
+
+class NamePatternMatcher:
+    """
+    文件名模式匹配器
+
+    运行开始时把每个模式预编译一次，之后逐个调用已编译正则的 search，
+    省去每个文件、每个模式一次的 re 缓存查找；结果与逐个 re.search(pattern, filename) 相同。
+    """
+
+    def __init__(self, name_patterns):
+        self._patterns = []
+        for pattern_name, pattern in name_patterns.items():
+            try:
+                self._patterns.append((pattern_name, re.compile(pattern)))
+            except re.error as e:
+                raise ValueError(f"文件名模式 '{pattern_name}' 不是有效的正则表达式: {e}")
+
+    def matches(self, text):
+        """返回 text 匹配的所有模式名（按模式定义顺序）"""
+        return [pattern_name for pattern_name, compiled in self._patterns if compiled.search(text)]
+
+    def first_match(self, text):
+        """返回按模式定义顺序第一个匹配的模式名，没有匹配时返回 None"""
+        for pattern_name, compiled in self._patterns:
+            if compiled.search(text):
+                return pattern_name
+        return None
+
+class KeywordMatcher:
+    """
+    关键词匹配器（Aho-Corasick 自动机）
 
-def classify_files(source_path, target_path, selected_types=None, name_patterns=None, keywords=None, output_callback=None):
+    运行开始时由关键词列表构建一次，之后每个文件名只需扫描一遍即可找到所有出现的关键词，
+    代价与关键词数量无关。多个关键词同时出现时返回列表中最靠前的一个，
+    与逐个 `keyword in filename` 判断的结果一致；空字符串关键词匹配任意文件名。
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        # 重复的关键词只保留第一次出现的位置
+        first_index = {}
+        for index, keyword in enumerate(self.keywords):
+            first_index.setdefault(keyword, index)
+        self._empty_index = first_index.pop('', None)
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, index in first_index.items():
+                self._automaton.add_word(keyword, index)
+            if first_index:
+                self._automaton.make_automaton()
+            else:
+                self._automaton = None
+            return
+
+        # 纯 Python 实现：goto 转移表、fail 失配指针，
+        # best[state] 为该状态及其后缀链上所有关键词的最小列表位置
+        self._goto = [{}]
+        best = [None]
+        for keyword, index in first_index.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    best.append(None)
+                state = next_state
+            best[state] = index
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail_state = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._goto[fail_state].get(char, 0) if state else 0
+                inherited = best[self._fail[next_state]]
+                if inherited is not None and (best[next_state] is None or inherited < best[next_state]):
+                    best[next_state] = inherited
+                queue.append(next_state)
+        self._best = best
+
+    def first_match(self, text):
+        """返回 text 中出现的、在关键词列表中最靠前的关键词，没有匹配时返回 None"""
+        best_index = self._empty_index
+        if ahocorasick is not None:
+            if self._automaton is not None:
+                for _, index in self._automaton.iter(text):
+                    if best_index is None or index < best_index:
+                        best_index = index
+        else:
+            goto, fail, best = self._goto, self._fail, self._best
+            state = 0
+            for char in text:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                index = best[state]
+                if index is not None and (best_index is None or index < best_index):
+                    best_index = index
+        return None if best_index is None else self.keywords[best_index]
+
+def _type_destination(file_path, target_path, selected_types, main_types, sub_types, detector):
+    """按文件类型确定目标文件夹，不在所选类型中的文件放入 other 文件夹"""
+    file_type, extension = detector.detect(file_path)
+    sub_file_type = None
+    if file_type in SUB_TYPES:
+        sub_file_type = get_sub_file_type(extension, file_type)
+    
+    # 如果指定了文件类型，则只处理这些类型的文件
+    if selected_types is not None:
+        # 检查是否匹配主类型
+        main_type_match = file_type in main_types if main_types else True
+        
+        # 检查是否匹配子类型
+        sub_type_match = False
+        if sub_file_type:
+            full_sub_type = f"{file_type}.{sub_file_type}"
+            sub_type_match = full_sub_type in sub_types if sub_types else True
+        
+        # 如果既不匹配主类型也不匹配子类型，则放入"其他"文件夹
+        if not main_type_match and not sub_type_match:
+            return os.path.join(target_path, 'other')
+    
+    if selected_types and sub_file_type and f"{file_type}.{sub_file_type}" in sub_types:
+        return os.path.join(target_path, file_type, sub_file_type)
+    return os.path.join(target_path, file_type)
+
+def _split_selected_types(selected_types):
+    """把所选类型拆分为主类型列表和子类型列表（子类型保持 main.sub 的完整名称）"""
+    main_types = []
+    sub_types = []
+    if selected_types:
+        for file_type in selected_types:
+            if '.' in file_type:
+                main_type, sub_type = file_type.split('.', 1)
+                main_types.append(main_type)
+                sub_types.append(file_type)  # 保持完整名称
+            else:
+                main_types.append(file_type)
+    return main_types, sub_types
+
+# classify_files 在目标目录顶层创建的文件夹
+_CLASSIFY_OUTPUT_NAMES = set(FILE_TYPES) | {'name_pattern', 'keyword', 'other'}
+
+def _make_destination_rule(target_path, selected_types, name_patterns, keywords, transfer_mode, detector):
+    """构建 classify_files 的分类规则，返回根据文件路径确定目标文件夹列表的函数"""
+    main_types, sub_types = _split_selected_types(selected_types)
+    pattern_matcher = NamePatternMatcher(name_patterns) if name_patterns else None
+    keyword_matcher = KeywordMatcher(keywords) if keywords else None
+    
+    def get_destinations(file_path):
+        """逐个文件确定目标文件夹：文件名模式 > 关键词 > 文件类型"""
+        filename = file_path.name
+        
+        # 按文件名模式分类（优先级最高，一个文件可匹配多个模式）
+        if pattern_matcher is not None:
+            # 移动模式下源文件只能放到一个位置，只取第一个匹配的模式
+            if transfer_mode == 'move':
+                pattern_name = pattern_matcher.first_match(filename)
+                pattern_names = [pattern_name] if pattern_name is not None else []
+            else:
+                pattern_names = pattern_matcher.matches(filename)
+            if pattern_names:
+                return [os.path.join(target_path, 'name_pattern', pattern_name) for pattern_name in pattern_names]
+        
+        # 按关键词分类（优先级次之，按列表顺序第一个匹配的关键词）
+        if keyword_matcher is not None:
+            keyword = keyword_matcher.first_match(filename)
+            if keyword is not None:
+                return [os.path.join(target_path, 'keyword', keyword)]
+        
+        # 按文件类型分类（优先级最低）
+        return [_type_destination(file_path, target_path, selected_types, main_types, sub_types, detector)]
+    
+    return get_destinations
+
+def classify_files(source_path, target_path, selected_types=None, name_patterns=None, keywords=None, output_callback=None,
+                   progress_callback=None, max_workers=COPY_WORKERS, transfer_mode='copy',
+                   recursive=False, include=None, exclude=None, max_depth=None, sniff_content=False, dedup=False,
+                   incremental=False, progress=None):
     """
     分类指定目录下的文件
     
@@ -156,6 +1069,17 @@ def classify_files(source_path, target_path, selected_types=None, name_patterns=
         name_patterns (dict): 文件名模式字典，格式为 {'pattern_name': 'regex_pattern'}
         keywords (list): 关键词列表
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        progress_callback (function): 进度回调函数，参数为 0-100 的完成百分比
+        max_workers (int): 并行复制的线程数
+        transfer_mode (str): 传输方式，copy / move / hardlink / reflink，默认复制
+        recursive (bool): 是否递归处理子目录，默认只处理顶层文件
+        include (list): 只处理匹配这些 glob 模式的文件，如 ['*.pdf']
+        exclude (list): 跳过匹配这些 glob 模式的文件和目录
+        max_depth (int): 递归时的最大子目录深度，None 表示不限
+        sniff_content (bool): 是否读取文件头识别扩展名缺失或错误的文件（结果缓存在目标目录中）
+        dedup (bool): 是否跳过内容重复的文件（每份内容只传输一次，重复文件记录到日志）
+        incremental (bool): 增量模式，跳过上次分类后大小和修改时间都没有变化的文件（清单保存在目标目录中）
+        progress (ProgressContext): 进度/取消上下文，提供时代替 progress_callback
     """
     # 检查源目录是否存在
     if not os.path.exists(source_path):
@@ -167,136 +1091,23 @@ def classify_files(source_path, target_path, selected_types=None, name_patterns=
         raise FileNotFoundError(error_msg)
     
     # 提取主类型和子类型
-    main_types = []
-    sub_types = []
-    
-    if selected_types:
-        for file_type in selected_types:
-            if '.' in file_type:
-                main_type, sub_type = file_type.split('.', 1)
-                main_types.append(main_type)
-                sub_types.append(file_type)  # 保持完整名称
-            else:
-                main_types.append(file_type)
+    main_types, sub_types = _split_selected_types(selected_types)
     
     # 创建文件夹
     create_folders(target_path, main_types if main_types else selected_types, sub_types, name_patterns, keywords)
     
-    # 预先收集所有文件，提高处理效率
-    source = Path(source_path)
-    all_files = [f for f in source.iterdir() if f.is_file()]
-    
-    # 按分类类型组织文件，减少重复操作
-    name_pattern_files = defaultdict(list)
-    keyword_files = defaultdict(list)
-    type_files = defaultdict(list)
-    
-    # 第一遍扫描：分类文件
-    for file_path in all_files:
-        filename = file_path.name
-        extension = file_path.suffix
-        
-        # 按文件名模式分类
-        if name_patterns:
-            for pattern_name, pattern in name_patterns.items():
-                if re.search(pattern, filename):
-                    name_pattern_files[pattern_name].append(file_path)
-        
-        # 按关键词分类
-        if keywords:
-            for keyword in keywords:
-                if keyword in filename:
-                    keyword_files[keyword].append(file_path)
-        
-        # 按文件类型分类
-        file_type = get_file_type(extension)
-        type_files[file_type].append(file_path)
-    
-    # 处理按文件名模式分类的文件（优先级最高）
-    processed_files = set()
-    destination_folders = set()
-    moved_files_count = 0
-    if name_patterns:
-        for pattern_name, files in name_pattern_files.items():
-            destination_folder = os.path.join(target_path, 'name_pattern', pattern_name)
-            destination_folders.add(destination_folder)
-            for file_path in files:
-                success, dest_path = move_file(file_path, destination_folder, output_callback)
-                if success:
-                    moved_files_count += 1
-                processed_files.add(str(file_path))
-    
-    # 处理按关键词分类的文件（优先级次之）
-    if keywords:
-        for keyword, files in keyword_files.items():
-            destination_folder = os.path.join(target_path, 'keyword', keyword)
-            destination_folders.add(destination_folder)
-            for file_path in files:
-                # 只处理尚未被处理的文件
-                if str(file_path) not in processed_files:
-                    success, dest_path = move_file(file_path, destination_folder, output_callback)
-                    if success:
-                        moved_files_count += 1
-                    processed_files.add(str(file_path))
-    
-    # 处理按文件类型分类的文件（优先级最低）
-    other_files = []
-    for file_type, files in type_files.items():
-        for file_path in files:
-            # 只处理尚未被处理的文件
-            if str(file_path) not in processed_files:
-                # 如果指定了文件类型，则只处理这些类型的文件
-                if selected_types is not None:
-                    # 检查是否匹配主类型
-                    main_type_match = file_type in main_types if main_types else True
-                    
-                    # 检查是否匹配子类型
-                    sub_file_type = None
-                    if file_type in SUB_TYPES:
-                        sub_file_type = get_sub_file_type(file_path.suffix, file_type)
-                    
-                    sub_type_match = False
-                    if sub_file_type:
-                        full_sub_type = f"{file_type}.{sub_file_type}"
-                        sub_type_match = full_sub_type in sub_types if sub_types else True
-                    
-                    # 如果既不匹配主类型也不匹配子类型，则跳过
-                    if not main_type_match and not sub_type_match:
-                        other_files.append(file_path)
-                        continue
-                
-                # 确定目标文件夹
-                sub_file_type = None
-                if file_type in SUB_TYPES:
-                    sub_file_type = get_sub_file_type(file_path.suffix, file_type)
-                
-                if selected_types and sub_file_type:
-                    full_sub_type = f"{file_type}.{sub_file_type}"
-                    if full_sub_type in sub_types:
-                        destination_folder = os.path.join(target_path, file_type, sub_file_type)
-                    else:
-                        destination_folder = os.path.join(target_path, file_type)
-                else:
-                    destination_folder = os.path.join(target_path, file_type)
-                
-                destination_folders.add(destination_folder)
-                success, dest_path = move_file(file_path, destination_folder, output_callback)
-                if success:
-                    moved_files_count += 1
-                processed_files.add(str(file_path))
-    
-    # 处理未分类的文件（放入"其他"文件夹）
-    for file_path in other_files:
-        if str(file_path) not in processed_files:
-            other_folder = os.path.join(target_path, 'other')
-            destination_folders.add(other_folder)
-            os.makedirs(other_folder, exist_ok=True)
-            success, dest_path = move_file(file_path, other_folder, output_callback)
-            if success:
-                moved_files_count += 1
+    walk_options = dict(recursive=recursive, include=include, exclude=exclude, max_depth=max_depth)
+    detector = FileTypeDetector(sniff_content, target_path)
+    get_destinations = _make_destination_rule(target_path, selected_types, name_patterns, keywords, transfer_mode, detector)
+    try:
+        total_files, moved_files_count, destination_folders = _classify_stream(
+            source_path, target_path, get_destinations, output_callback, progress or ProgressContext(progress_callback),
+            max_workers, transfer_mode, walk_options, _CLASSIFY_OUTPUT_NAMES, dedup, incremental)
+    finally:
+        detector.close()
     
     # 输出操作总结
-    summary_msg = f"操作成功完成！总共处理了 {len(all_files)} 个文件，实际移动了 {moved_files_count} 个文件"
+    summary_msg = f"操作成功完成！总共处理了 {total_files} 个文件，实际移动了 {moved_files_count} 个文件"
     folder_msg = "文件已移动到以下文件夹:"
     if output_callback:
         output_callback(summary_msg)
@@ -311,7 +1122,10 @@ def classify_files(source_path, target_path, selected_types=None, name_patterns=
     
     return True
 
-def classify_files_by_keywords(source_path, target_path, keywords, output_callback=None):
+def classify_files_by_keywords(source_path, target_path, keywords, output_callback=None,
+                               progress_callback=None, max_workers=COPY_WORKERS, transfer_mode='copy',
+                               recursive=False, include=None, exclude=None, max_depth=None, dedup=False,
+                               incremental=False, progress=None):
     """
     根据关键词分类文件（独立功能）
     
@@ -320,6 +1134,16 @@ def classify_files_by_keywords(source_path, target_path, keywords, output_callba
         target_path (str): 目标目录路径
         keywords (list): 关键词列表
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        progress_callback (function): 进度回调函数，参数为 0-100 的完成百分比
+        max_workers (int): 并行复制的线程数
+        transfer_mode (str): 传输方式，copy / move / hardlink / reflink，默认复制
+        recursive (bool): 是否递归处理子目录，默认只处理顶层文件
+        include (list): 只处理匹配这些 glob 模式的文件，如 ['*.pdf']
+        exclude (list): 跳过匹配这些 glob 模式的文件和目录
+        max_depth (int): 递归时的最大子目录深度，None 表示不限
+        dedup (bool): 是否跳过内容重复的文件（每份内容只传输一次，重复文件记录到日志）
+        incremental (bool): 增量模式，跳过上次分类后大小和修改时间都没有变化的文件（清单保存在目标目录中）
+        progress (ProgressContext): 进度/取消上下文，提供时代替 progress_callback
     """
     # 检查源目录是否存在
     if not os.path.exists(source_path):
@@ -339,49 +1163,22 @@ def classify_files_by_keywords(source_path, target_path, keywords, output_callba
     other_folder = os.path.join(target_path, 'other')
     os.makedirs(other_folder, exist_ok=True)
     
-    # 预先收集所有文件
-    source = Path(source_path)
-    all_files = [f for f in source.iterdir() if f.is_file()]
+    keyword_matcher = KeywordMatcher(keywords)
     
-    # 按关键词组织文件
-    keyword_files = defaultdict(list)
-    other_files = []  # 未匹配的文件
-    
-    for file_path in all_files:
-        filename = file_path.name
-        matched = False
-        for keyword in keywords:
-            if keyword in filename:
-                keyword_files[keyword].append(file_path)
-                matched = True
-                break  # 一个文件只匹配一个关键词
-        
-        if not matched:
-            other_files.append(file_path)
+    def get_destinations(file_path):
+        """一个文件只匹配一个关键词（列表中最靠前的），未匹配的文件放入"其他"文件夹"""
+        keyword = keyword_matcher.first_match(file_path.name)
+        if keyword is None:
+            return [other_folder]
+        return [os.path.join(target_path, 'keyword', keyword)]
     
-    # 处理按关键词分类的文件
-    destination_folders = set()
-    moved_files_count = 0
-    
-    # 移动匹配关键词的文件
-    for keyword, files in keyword_files.items():
-        destination_folder = os.path.join(target_path, 'keyword', keyword)
-        destination_folders.add(destination_folder)
-        for file_path in files:
-            success, dest_path = move_file(file_path, destination_folder, output_callback)
-            if success:
-                moved_files_count += 1
-    
-    # 移动未匹配的文件到"其他"文件夹
-    if other_files:
-        destination_folders.add(other_folder)
-        for file_path in other_files:
-            success, dest_path = move_file(file_path, other_folder, output_callback)
-            if success:
-                moved_files_count += 1
+    walk_options = dict(recursive=recursive, include=include, exclude=exclude, max_depth=max_depth)
+    total_files, moved_files_count, destination_folders = _classify_stream(
+        source_path, target_path, get_destinations, output_callback, progress or ProgressContext(progress_callback),
+        max_workers, transfer_mode, walk_options, {'keyword', 'other'}, dedup, incremental)
     
     # 输出操作总结
-    summary_msg = f"关键词分类操作成功完成！总共处理了 {len(all_files)} 个文件，实际移动了 {moved_files_count} 个文件"
+    summary_msg = f"关键词分类操作成功完成！总共处理了 {total_files} 个文件，实际移动了 {moved_files_count} 个文件"
     folder_msg = "文件已移动到以下文件夹:"
     if output_callback:
         output_callback(summary_msg)
@@ -396,7 +1193,10 @@ def classify_files_by_keywords(source_path, target_path, keywords, output_callba
     
     return True
 
-def classify_files_by_extension(source_path, target_path, output_callback=None):
+def classify_files_by_extension(source_path, target_path, output_callback=None,
+                                progress_callback=None, max_workers=COPY_WORKERS, transfer_mode='copy',
+                                recursive=False, include=None, exclude=None, max_depth=None, dedup=False,
+                                incremental=False, progress=None):
     """
     根据文件扩展名分类文件
     
@@ -404,6 +1204,16 @@ def classify_files_by_extension(source_path, target_path, output_callback=None):
         source_path (str): 源文件目录路径
         target_path (str): 目标目录路径
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        progress_callback (function): 进度回调函数，参数为 0-100 的完成百分比
+        max_workers (int): 并行复制的线程数
+        transfer_mode (str): 传输方式，copy / move / hardlink / reflink，默认复制
+        recursive (bool): 是否递归处理子目录，默认只处理顶层文件
+        include (list): 只处理匹配这些 glob 模式的文件，如 ['*.pdf']
+        exclude (list): 跳过匹配这些 glob 模式的文件和目录
+        max_depth (int): 递归时的最大子目录深度，None 表示不限
+        dedup (bool): 是否跳过内容重复的文件（每份内容只传输一次，重复文件记录到日志）
+        incremental (bool): 增量模式，跳过上次分类后大小和修改时间都没有变化的文件（清单保存在目标目录中）
+        progress (ProgressContext): 进度/取消上下文，提供时代替 progress_callback
     """
     # 检查源目录是否存在
     if not os.path.exists(source_path):
@@ -414,33 +1224,22 @@ def classify_files_by_extension(source_path, target_path, output_callback=None):
             print(error_msg)
         raise FileNotFoundError(error_msg)
     
-    # 预先收集所有文件
-    source = Path(source_path)
-    all_files = [f for f in source.iterdir() if f.is_file()]
-    
-    # 按扩展名组织文件
-    extension_files = defaultdict(list)
-    for file_path in all_files:
-        extension = file_path.suffix.lower()
-        # 如果没有扩展名，归类到"无扩展名"文件夹
+    def get_destinations(file_path):
+        """创建以扩展名命名的文件夹（包括点号），没有扩展名的归类到"无扩展名"文件夹"""
+        extension = get_file_extension(file_path.name)
+        extension = f".{extension}" if extension else ""
         if not extension:
             extension = "无扩展名"
-        extension_files[extension].append(file_path)
+        return [os.path.join(target_path, extension)]
     
-    # 处理按扩展名分类的文件
-    destination_folders = set()
-    moved_files_count = 0
-    for extension, files in extension_files.items():
-        # 创建以扩展名命名的文件夹（包括点号）
-        destination_folder = os.path.join(target_path, extension)
-        destination_folders.add(destination_folder)
-        for file_path in files:
-            success, dest_path = move_file(file_path, destination_folder, output_callback)
-            if success:
-                moved_files_count += 1
+    walk_options = dict(recursive=recursive, include=include, exclude=exclude, max_depth=max_depth)
+    total_files, moved_files_count, destination_folders = _classify_stream(
+        source_path, target_path, get_destinations, output_callback, progress or ProgressContext(progress_callback),
+        max_workers, transfer_mode, walk_options, lambda name: name.startswith('.') or name == "无扩展名", dedup,
+        incremental)
     
     # 输出操作总结
-    summary_msg = f"按扩展名分类操作成功完成！总共处理了 {len(all_files)} 个文件，实际移动了 {moved_files_count} 个文件"
+    summary_msg = f"按扩展名分类操作成功完成！总共处理了 {total_files} 个文件，实际移动了 {moved_files_count} 个文件"
     folder_msg = "文件已移动到以下文件夹:"
     if output_callback:
         output_callback(summary_msg)
@@ -455,6 +1254,234 @@ def classify_files_by_extension(source_path, target_path, output_callback=None):
     
     return True
 
+class _DirectorySnapshot:
+    """
+    监视模式的增量目录扫描
+
+    记录每个目录的修改时间和上次的扫描结果。新建、删除、重命名文件都会改变所在目录的修改时间，
+    因此每次扫描只 stat 目录本身，只有修改时间变化或被 invalidate 标记的目录才重新列出并返回其中的文件；
+    修改时间距今不到 1 秒的目录下次仍会重新列出（同一时间粒度内的后续变化不会改变修改时间）。
+    """
+
+    def __init__(self, source_path, walk_options, skip_dir):
+        self.source_path = source_path
+        self.walk_options = walk_options
+        self.skip_dir = skip_dir
+        # {目录: (修改时间, 文件列表, 子目录列表)}
+        self._directories = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def invalidate(self, path):
+        """标记目录需要重新列出（可在任意线程调用）"""
+        with self._lock:
+            self._dirty.add(os.path.normpath(path))
+
+    def scan(self, full=False):
+        """
+        返回 (需要检查的文件列表, 当前全部文件集合)
+        需要检查的文件为重新列出的目录中的文件；full 为 True 时返回全部文件
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        options = self.walk_options
+        recent_ns = time.time_ns() - 1_000_000_000
+        changed = []
+        all_files = set()
+        visited = {}
+        stack = [(self.source_path, '', 0)]
+        while stack:
+            directory, prefix, depth = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._directories.get(directory)
+            if cached is None or cached[0] != mtime_ns or os.path.normpath(directory) in dirty:
+                scanned = _scan_directory(directory, prefix, depth, options['recursive'], options['include'],
+                                          options['exclude'], options['max_depth'], self.skip_dir)
+                if scanned is None:
+                    continue
+                files, sub_directories = scanned
+                changed.extend(files)
+            else:
+                _, files, sub_directories = cached
+                if full:
+                    changed.extend(files)
+            visited[directory] = (mtime_ns if mtime_ns < recent_ns else None, files, sub_directories)
+            all_files.update(files)
+            stack.extend(reversed(sub_directories))
+        self._directories = visited
+        return changed, all_files
+
+class _WakeOnEvent:
+    """
+    watchdog 事件处理器：把事件涉及的目录标记为需要重新列出并唤醒监视循环
+    ignore(path) 为 True 的路径（分类输出目录中由本监视自己写入的文件）不触发扫描
+    """
+
+    def __init__(self, wake_event, snapshot, ignore):
+        self.wake_event = wake_event
+        self.snapshot = snapshot
+        self.ignore = ignore
+
+    def dispatch(self, event):
+        woken = False
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not path or self.ignore(path):
+                continue
+            # 文件原地修改不改变目录的修改时间，标记其所在目录（目录事件同时标记目录本身）
+            self.snapshot.invalidate(os.path.dirname(path))
+            if event.is_directory:
+                self.snapshot.invalidate(path)
+            woken = True
+        if woken:
+            self.wake_event.set()
+
+def _watch_ignore_filter(source_path, target_path, output_names):
+    """
+    返回判断路径是否属于分类输出的函数：目标目录（或与源目录相同时顶层的分类输出文件夹）
+    及其中的文件，以及目标目录中的索引文件
+    """
+    source_real = os.path.realpath(source_path)
+    target_real = os.path.realpath(target_path)
+
+    def ignore(path):
+        path_real = os.path.realpath(path)
+        if os.path.dirname(path_real) == target_real and os.path.basename(path_real).startswith(_INDEX_FILENAMES):
+            return True
+        if path_real != target_real and not path_real.startswith(target_real + os.sep):
+            return False
+        if target_real != source_real:
+            return True
+        relative = os.path.relpath(path_real, target_real)
+        return relative != os.curdir and relative.split(os.sep)[0] in output_names
+
+    return ignore
+
+def watch_and_classify(source_path, target_path, selected_types=None, name_patterns=None, keywords=None,
+                       output_callback=None, max_workers=COPY_WORKERS, transfer_mode='copy',
+                       recursive=False, include=None, exclude=None, max_depth=None, sniff_content=False,
+                       poll_interval=WATCH_POLL_INTERVAL, settle_seconds=WATCH_SETTLE_SECONDS, stop_event=None):
+    """
+    监视模式：持续监视源目录，文件写入完成后按 classify_files 的规则分类
+    
+    安装了 watchdog 时由文件系统事件触发扫描，否则每 poll_interval 秒轮询一次。每次扫描只重新列出
+    修改时间变化（或收到事件）的目录，轮询模式另外每 WATCH_FULL_SCAN_SECONDS 秒完整检查一次全部文件；
+    分类输出目录中的变化（本监视自己传输的文件）不会触发扫描。
+    新出现或有变化的文件要在 settle_seconds 内大小和修改时间都不再变化才会处理，避免复制写了一半的文件。
+    分类清单保存在目标目录中，重新启动监视时不会重复处理已分类且没有变化的文件。
+    
+    Args:
+        source_path (str): 监视的源目录路径
+        target_path (str): 目标目录路径
+        selected_types, name_patterns, keywords: 分类规则，与 classify_files 相同
+        output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        max_workers (int): 后台复制的线程数
+        transfer_mode (str): 传输方式，copy / move / hardlink / reflink，默认复制
+        recursive, include, exclude, max_depth: 遍历范围，与 classify_files 相同
+        sniff_content (bool): 是否读取文件头识别扩展名缺失或错误的文件
+        poll_interval (float): 轮询间隔（秒）
+        settle_seconds (float): 文件保持不变多久视为写入完成（秒）
+        stop_event (threading.Event): 设置后停止监视，None 表示一直运行直到 Ctrl+C
+    """
+    def _print(message):
+        if output_callback:
+            output_callback(message)
+        else:
+            print(message)
+    
+    # 检查源目录是否存在
+    if not os.path.exists(source_path):
+        error_msg = f"源目录 {source_path} 不存在"
+        _print(error_msg)
+        raise FileNotFoundError(error_msg)
+    
+    main_types, sub_types = _split_selected_types(selected_types)
+    create_folders(target_path, main_types if main_types else selected_types, sub_types, name_patterns, keywords)
+    
+    skip_dir = _output_dir_filter(source_path, target_path, _CLASSIFY_OUTPUT_NAMES)
+    target_real = os.path.realpath(target_path)
+    walk_options = dict(recursive=recursive, include=include, exclude=exclude, max_depth=max_depth)
+    snapshot = _DirectorySnapshot(source_path, walk_options, skip_dir)
+    
+    stop_event = stop_event or threading.Event()
+    wake_event = threading.Event()
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        ignore = _watch_ignore_filter(source_path, target_path, _CLASSIFY_OUTPUT_NAMES)
+        observer.schedule(_WakeOnEvent(wake_event, snapshot, ignore), source_path, recursive=recursive)
+        observer.start()
+        _print(f"开始监视 {source_path}（文件系统事件）")
+    else:
+        _print(f"开始监视 {source_path}（每 {poll_interval} 秒轮询一次）")
+    
+    detector = FileTypeDetector(sniff_content, target_path)
+    get_destinations = _make_destination_rule(target_path, selected_types, name_patterns, keywords, transfer_mode, detector)
+    manifest = ClassifyManifest(target_path)
+    scheduler = CopyScheduler(output_callback, None, max_workers, transfer_mode, on_transferred=manifest.record)
+    
+    # 已处理文件的 (大小, 修改时间)，以及等待写入完成的文件 {路径: (大小, 修改时间, 开始稳定的时间)}
+    processed = {}
+    pending = {}
+    rescan = True
+    last_full_scan = None
+    try:
+        while not stop_event.is_set():
+            if rescan:
+                # 重新列出有变化的目录：其中的文件进入待检查列表，已处理且没有变化的文件在检查时移除
+                wake_event.clear()
+                now = time.monotonic()
+                full = observer is None and (last_full_scan is None or now - last_full_scan >= WATCH_FULL_SCAN_SECONDS)
+                if full:
+                    last_full_scan = now
+                changed, seen = snapshot.scan(full)
+                for file_path in changed:
+                    if file_path.name.startswith(_INDEX_FILENAMES) and os.path.realpath(file_path.parent) == target_real:
+                        continue
+                    if file_path not in pending:
+                        pending[file_path] = (None, None, 0)
+                # 已不存在的文件（如移动模式下已移走的）不再保留记录
+                processed = {path: value for path, value in processed.items() if path in seen}
+            
+            # 检查等待中的文件是否已写入完成
+            now = time.monotonic()
+            for file_path, (size, mtime_ns, stable_since) in list(pending.items()):
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    del pending[file_path]
+                    continue
+                current = (stat.st_size, stat.st_mtime_ns)
+                if processed.get(file_path) == current:
+                    del pending[file_path]
+                elif (size, mtime_ns) != current:
+                    pending[file_path] = current + (now,)
+                elif now - stable_since >= settle_seconds:
+                    del pending[file_path]
+                    processed[file_path] = current
+                    if manifest.is_unchanged(file_path):
+                        continue
+                    for destination_folder in get_destinations(file_path):
+                        scheduler.submit(file_path, destination_folder)
+            manifest.flush()
+            
+            # 有文件系统事件时立即重新扫描；轮询模式下每次都重新扫描
+            rescan = wake_event.wait(poll_interval) or observer is None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        scheduler.wait()
+        manifest.close()
+        detector.close()
+    
+    _print(f"监视已停止，共传输了 {scheduler.moved_count} 个文件")
+    return True
+
 def get_supported_types():
     """获取所有支持的文件类型"""
     return list(FILE_TYPES.keys())
@@ -466,9 +1493,21 @@ def file_classify():
     parser.add_argument('-f', '--formats', nargs='+', help='要分类的文件格式，如：image.png_image image.jpg_image（默认为全部）')
     parser.add_argument('-n', '--name_patterns', nargs='+', help='按文件名模式分类，如：date number')
     parser.add_argument('-k', '--keywords', nargs='+', help='按关键词分类，如：project report')
+    parser.add_argument('-m', '--mode', choices=list(TRANSFER_MODES), default='copy',
+                        help='传输方式：copy 复制（默认）、move 移动、hardlink 硬链接、reflink 写时复制克隆')
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归处理子目录中的文件')
+    parser.add_argument('--include', nargs='+', help='只处理匹配这些通配符的文件，如：*.pdf *.docx')
+    parser.add_argument('--exclude', nargs='+', help='跳过匹配这些通配符的文件和目录，如：*.tmp .git')
+    parser.add_argument('--max-depth', type=int, help='递归时的最大子目录深度（默认不限）')
+    parser.add_argument('-s', '--sniff', action='store_true', help='读取文件头识别扩展名缺失或错误的文件')
+    parser.add_argument('-d', '--dedup', action='store_true', help='跳过内容重复的文件，每份内容只传输一次')
+    parser.add_argument('-i', '--incremental', action='store_true', help='增量模式，跳过上次分类后没有变化的文件')
+    parser.add_argument('-w', '--watch', action='store_true', help='监视模式，持续分类新写入源目录的文件（Ctrl+C 停止）')
+    parser.add_argument('-c', '--pattern_config', help='自定义文件名模式配置文件（JSON，默认读取脚本目录下的 name_patterns.json）')
     parser.add_argument('-l', '--list', action='store_true', help='列出所有支持的文件格式')
     
     args = parser.parse_args()
+    available_patterns = load_name_patterns(args.pattern_config)
     
     # 如果使用了-l参数，列出所有支持的格式并退出
     if args.list:
@@ -480,7 +1519,7 @@ def file_classify():
             for sub_type_name, extensions in sub_types.items():
                 print(f"  {main_type}.{sub_type_name}: {', '.join(extensions)}")
         print("\n支持的文件名模式:")
-        for pattern_name, pattern in NAME_PATTERNS.items():
+        for pattern_name, pattern in available_patterns.items():
             print(f"  {pattern_name}: {pattern}")
         return
     
@@ -494,18 +1533,41 @@ def file_classify():
     if args.name_patterns:
         name_patterns = {}
         for pattern_name in args.name_patterns:
-            if pattern_name in NAME_PATTERNS:
-                name_patterns[pattern_name] = NAME_PATTERNS[pattern_name]
+            if pattern_name in available_patterns:
+                name_patterns[pattern_name] = available_patterns[pattern_name]
             else:
                 print(f"警告: 未知的文件名模式 '{pattern_name}'，将忽略")
     
     # 使用参数调用分类函数
     target_directory = args.target if args.target else args.source_directory
+    if args.watch:
+        watch_and_classify(
+            args.source_directory,
+            target_directory,
+            args.formats if args.formats else None,
+            name_patterns if name_patterns else None,
+            args.keywords if args.keywords else None,
+            transfer_mode=args.mode,
+            recursive=args.recursive,
+            include=args.include,
+            exclude=args.exclude,
+            max_depth=args.max_depth,
+            sniff_content=args.sniff
+        )
+        return
     classify_files(
         args.source_directory, 
         target_directory, 
         args.formats if args.formats else None,
         name_patterns if name_patterns else None,
-        args.keywords if args.keywords else None
+        args.keywords if args.keywords else None,
+        transfer_mode=args.mode,
+        recursive=args.recursive,
+        include=args.include,
+        exclude=args.exclude,
+        max_depth=args.max_depth,
+        sniff_content=args.sniff,
+        dedup=args.dedup,
+        incremental=args.incremental
     )
     print("文件分类完成!")
\ No newline at end of file
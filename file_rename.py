@@ -1,8 +1,306 @@
 import os
+import json
+import uuid
+import string
 import shutil
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
-def rename_files_sequentially(source_path, prefix="", start_number=1, digits=4, keyword="", extension_filter=None, output_callback=None):
+# 撤销日志（位于重命名的目录中，每行记录一次已完成的重命名，用于失败回滚和撤销上一次批量重命名）
+RENAME_JOURNAL_FILENAME = "重命名撤销日志.jsonl"
+
+# 两阶段重命名使用的临时文件名标记
+_TEMP_NAME_MARKER = ".renametmp-"
+
+# 重命名冲突的处理方式：abort 存在冲突时整批不执行，skip 跳过冲突的文件，
+# auto_suffix 在新文件名后追加序号，overwrite 覆盖计划外的同名文件
+CONFLICT_POLICIES = ("abort", "skip", "auto_suffix", "overwrite")
+
+# 并发执行重命名的线程数（网络共享上每次重命名都是一次网络往返）
+RENAME_WORKERS = 8
+
+# 每累计多少条重命名结果通过 output_callback 输出一次
+RENAME_REPORT_BATCH = 200
+
+# 命名模板中可用的字段，以及其中需要读取文件属性的字段
+_TEMPLATE_FIELDS = ("prefix", "n", "name", "ext", "size", "mtime", "ctime", "excel")
+_STAT_FIELDS = {"size", "mtime", "ctime"}
+
+# 文件名中不允许出现的字符统一替换为下划线
+_UNSAFE_NAME_CHARS = str.maketrans({char: "_" for char in '/\\:*?"<>|'})
+
+def _creation_time(stat_result):
+    """文件创建时间：有 st_birthtime 时使用，否则为 st_ctime（Windows 上即创建时间，Linux 上是元数据最后变更时间）"""
+    return getattr(stat_result, "st_birthtime", stat_result.st_ctime)
+
+def _list_rename_files(source_path, extension_filter=None, with_stat=False):
+    """获取目录中待重命名的文件（按文件名排序），跳过撤销日志和残留的临时文件；with_stat 时返回 [(路径, stat结果)]"""
+    extensions = [ext.lower() for ext in extension_filter] if extension_filter is not None else None
+    files = []
+    with os.scandir(source_path) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            if entry.name == RENAME_JOURNAL_FILENAME or _TEMP_NAME_MARKER in entry.name:
+                continue
+            file_path = Path(entry.path)
+            # 如果指定了扩展名过滤器，则只添加匹配的文件
+            if extensions is None or file_path.suffix.lower() in extensions:
+                files.append((file_path, entry.stat()) if with_stat else file_path)
+    
+    # 按文件名排序，确保重命名的一致性
+    files.sort()
+    return files
+
+def plan_renames(files, new_filenames, conflict_policy="abort"):
+    """
+    根据一次性计算好的新文件名生成重命名计划
+    
+    Args:
+        files (list): 待重命名的文件路径列表
+        new_filenames (list): 与 files 一一对应的新文件名
+        conflict_policy (str): 冲突处理方式，见 CONFLICT_POLICIES
+    
+    Returns:
+        list: 与 files 一一对应的计划条目，每项为字典:
+            source / target: 原路径和新路径
+            action: 'rename' 重命名, 'overwrite' 覆盖计划外的同名文件后重命名, 'unchanged' 新旧名称相同,
+                    'skip' 因冲突跳过, 'conflict' 存在冲突（abort 策略下整批不执行）
+            conflict: None 或冲突原因 'duplicate'（与前面的文件重名）、'existing'（新文件名已被计划外的文件占用）、
+                      'blocked'（目标是被跳过文件的原名）
+        目标名是计划内其他文件原名的（链式或循环重命名，如就地重新编号）属于正常计划，执行时通过临时文件名完成
+    """
+    if conflict_policy not in CONFLICT_POLICIES:
+        raise ValueError(f"不支持的冲突处理方式: {conflict_policy}，可选: {', '.join(CONFLICT_POLICIES)}")
+    
+    # 每个目录只扫描一次，代替逐个文件 exists() 检查
+    directory_names = {}
+    def _names_in(folder):
+        if folder not in directory_names:
+            with os.scandir(folder) as it:
+                directory_names[folder] = {os.path.normcase(entry.name) for entry in it}
+        return directory_names[folder]
+    
+    sources = {os.path.normcase(str(file_path)) for file_path in files}
+    plan = []
+    planned_targets = set()
+    for file_path, new_filename in zip(files, new_filenames):
+        new_file_path = file_path.parent / new_filename
+        target_key = os.path.normcase(str(new_file_path))
+        entry = {"source": file_path, "target": new_file_path, "action": "rename", "conflict": None}
+        if target_key in planned_targets:
+            entry["conflict"] = "duplicate"
+        else:
+            planned_targets.add(target_key)
+            if new_file_path == file_path:
+                entry["action"] = "unchanged"
+            elif target_key not in sources and os.path.normcase(new_filename) in _names_in(file_path.parent):
+                entry["conflict"] = "existing"
+        plan.append(entry)
+    
+    # 按策略处理冲突
+    for entry in plan:
+        if entry["conflict"] is None:
+            continue
+        if conflict_policy == "auto_suffix":
+            entry["target"] = _suffixed_target(entry["target"], planned_targets, _names_in(entry["target"].parent))
+            planned_targets.add(os.path.normcase(str(entry["target"])))
+        elif conflict_policy == "overwrite" and entry["conflict"] == "existing":
+            entry["action"] = "overwrite"
+        else:
+            # 同批次内重名时覆盖会丢失本批次的文件，因此 overwrite 策略下也跳过
+            entry["action"] = "conflict" if conflict_policy == "abort" else "skip"
+    
+    # 目标名被跳过的文件占用时（原名保持不变），依赖它的重命名也无法执行
+    stalled = {"skip", "conflict"}
+    by_target = {os.path.normcase(str(entry["target"])): entry for entry in plan
+                 if entry["action"] in ("rename", "overwrite")}
+    blocked_keys = [os.path.normcase(str(entry["source"])) for entry in plan if entry["action"] in stalled]
+    while blocked_keys:
+        entry = by_target.pop(blocked_keys.pop(), None)
+        if entry is not None:
+            entry["action"] = "conflict" if conflict_policy == "abort" else "skip"
+            entry["conflict"] = "blocked"
+            blocked_keys.append(os.path.normcase(str(entry["source"])))
+    return plan
+
+def _suffixed_target(target, planned_targets, existing_names):
+    """为冲突的文件生成未被占用的新路径（在文件名后追加 _1、_2 ...）"""
+    counter = 1
+    while True:
+        candidate = target.with_name(f"{target.stem}_{counter}{target.suffix}")
+        if (os.path.normcase(str(candidate)) not in planned_targets
+                and os.path.normcase(candidate.name) not in existing_names):
+            return candidate
+        counter += 1
+
+def plan_as_data(plan):
+    """把计划条目转换为只含字符串的字典列表，便于预览或序列化"""
+    return [{"source": str(entry["source"]), "target": str(entry["target"]),
+             "action": entry["action"], "conflict": entry["conflict"]} for entry in plan]
+
+def _rollback(completed, _print):
+    """按相反顺序撤销已完成的重命名"""
+    failed = 0
+    for src, dst in reversed(completed):
+        try:
+            os.rename(dst, src)
+        except OSError as e:
+            failed += 1
+            _print(f"回滚失败 {dst} -> {src}: {str(e)}")
+    return failed
+
+def execute_rename_plan(source_path, plan, output_callback=None, max_workers=RENAME_WORKERS):
+    """
+    执行重命名计划（plan_renames 的结果）中 action 为 rename 或 overwrite 的条目，返回成功重命名的文件数
+    
+    目标名是计划内其他文件原名的条目先改为临时文件名，然后执行其余的直接重命名，
+    最后把临时文件改为最终名称，因此链式和循环重命名（如 0002 -> 0001）都能完成。
+    同一阶段内的重命名互不依赖，由最多 max_workers 个线程并发执行，结果按 RENAME_REPORT_BATCH 条一批输出。
+    每完成一次重命名就写入撤销日志；任何一步失败时不再提交新的重命名，按相反顺序回滚本批已完成的重命名并抛出异常。
+    """
+    def _print(msg):
+        """内部打印函数，支持GUI输出"""
+        if output_callback:
+            output_callback(msg)
+        else:
+            print(msg)
+    
+    renames = [(entry["source"], entry["target"]) for entry in plan if entry["action"] in ("rename", "overwrite")]
+    overwrite_targets = {entry["target"] for entry in plan if entry["action"] == "overwrite"}
+    sources = {os.path.normcase(str(src)) for src, _ in renames}
+    batch_token = uuid.uuid4().hex[:8]
+    phase_one = []
+    direct = []
+    phase_three = []
+    for index, (src, dst) in enumerate(renames):
+        if os.path.normcase(str(dst)) in sources:
+            temp_path = src.parent / f"{_TEMP_NAME_MARKER}{batch_token}-{index}"
+            phase_one.append((src, temp_path, src))
+            phase_three.append((temp_path, dst, src))
+        else:
+            direct.append((src, dst, src))
+    
+    if not renames:
+        return 0
+    journal_path = os.path.join(source_path, RENAME_JOURNAL_FILENAME)
+    completed = []
+    errors = []
+    lock = threading.Lock()
+    renamed_count = 0
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        def _rename(step):
+            src, dst, original = step
+            # 已有重命名失败时不再执行新的重命名
+            if errors:
+                return False
+            try:
+                # 覆盖计划外的同名文件时使用 os.replace（被覆盖的文件无法通过撤销恢复）
+                if dst in overwrite_targets:
+                    os.replace(src, dst)
+                else:
+                    os.rename(src, dst)
+            except Exception as e:
+                with lock:
+                    errors.append((original, e))
+                return False
+            with lock:
+                completed.append((src, dst))
+                journal.write(json.dumps({"from": str(src), "to": str(dst)}, ensure_ascii=False) + "\n")
+                journal.flush()
+            return True
+        
+        def _run_phase(steps, report):
+            nonlocal renamed_count
+            if not steps or errors:
+                return
+            lines = []
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for step, succeeded in zip(steps, executor.map(_rename, steps)):
+                    if succeeded and report:
+                        renamed_count += 1
+                        lines.append(f"已重命名: {step[2].name} -> {step[1].name}")
+                        if len(lines) >= RENAME_REPORT_BATCH:
+                            _print("\n".join(lines))
+                            lines = []
+            if lines:
+                _print("\n".join(lines))
+        
+        # 第一阶段：被占用目标的源文件改为临时文件名
+        _run_phase(phase_one, False)
+        # 第二阶段：目标空闲的直接重命名
+        _run_phase(direct, True)
+        # 第三阶段：把临时文件改为最终名称（其目标在前两个阶段中已经腾出）
+        _run_phase(phase_three, True)
+    
+    error = None
+    if errors:
+        original, error = errors[0]
+        _print(f"重命名文件失败 {original.name}: {str(error)}" + (f"（另有 {len(errors) - 1} 个文件失败）" if len(errors) > 1 else ""))
+    
+    if error is not None:
+        _print(f"正在回滚本批次已完成的 {len(completed)} 步重命名...")
+        failed = _rollback(completed, _print)
+        if failed:
+            raise RuntimeError(f"重命名失败且有 {failed} 步未能回滚，撤销日志保留在 {journal_path}")
+        os.remove(journal_path)
+        raise RuntimeError(f"重命名失败，已全部回滚: {str(error)}")
+    return renamed_count
+
+def undo_last_rename(source_path, output_callback=None):
+    """根据撤销日志撤销上一次批量重命名"""
+    def _print(msg):
+        """内部打印函数，支持GUI输出"""
+        if output_callback:
+            output_callback(msg)
+        else:
+            print(msg)
+    
+    journal_path = os.path.join(source_path, RENAME_JOURNAL_FILENAME)
+    if not os.path.exists(journal_path):
+        _print("没有可撤销的重命名记录")
+        return False
+    completed = []
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        for line in journal:
+            line = line.strip()
+            if line:
+                step = json.loads(line)
+                completed.append((step["from"], step["to"]))
+    failed = _rollback(completed, _print)
+    os.remove(journal_path)
+    _print(f"已撤销 {len(completed) - failed} 步重命名" + (f"，{failed} 步失败" if failed else ""))
+    return failed == 0
+
+def _rename_with_plan(source_path, files, new_filenames, _print, conflict_policy="abort", dry_run=False,
+                      max_workers=RENAME_WORKERS):
+    """生成计划、按冲突策略处理并执行重命名（三个重命名函数共用），dry_run 时只返回计划数据"""
+    plan = plan_renames(files, new_filenames, conflict_policy)
+    conflicts = [entry for entry in plan if entry["conflict"] is not None]
+    
+    if dry_run:
+        counts = {}
+        for entry in plan:
+            counts[entry["action"]] = counts.get(entry["action"], 0) + 1
+        _print(f"重命名预览: 共 {len(plan)} 个文件，" + "，".join(f"{action} {count}" for action, count in counts.items()))
+        return plan_as_data(plan)
+    
+    if conflicts:
+        _print(f"警告：{len(conflicts)} 个文件重命名存在冲突（处理方式: {conflict_policy}）:")
+        for entry in conflicts:
+            _print(f"  {entry['source'].name} -> {entry['target'].name} [{entry['conflict']}: {entry['action']}]")
+        if conflict_policy == "abort":
+            _print("重命名操作已取消，未修改任何文件")
+            return False
+    
+    renamed_count = execute_rename_plan(source_path, plan, _print, max_workers)
+    _print(f"成功重命名 {renamed_count} 个文件")
+    return True
+
+def rename_files_sequentially(source_path, prefix="", start_number=1, digits=4, keyword="", extension_filter=None, output_callback=None, conflict_policy="abort", dry_run=False, max_workers=RENAME_WORKERS):
     """
     对文件进行批量重命名，按顺序编号
     
@@ -14,6 +312,9 @@ def rename_files_sequentially(source_path, prefix="", start_number=1, digits=4,
         keyword (str): 关键词，添加在序号后，默认为空
         extension_filter (list): 文件扩展名过滤器，只重命名指定类型的文件，如['.txt', '.pdf']，默认为None表示所有文件
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        conflict_policy (str): 冲突处理方式 abort / skip / auto_suffix / overwrite，默认 abort（有冲突时不执行）
+        dry_run (bool): 为True时只生成计划并返回 plan_as_data 的结果，不修改任何文件
+        max_workers (int): 并发执行重命名的线程数，默认为 RENAME_WORKERS
     """
     # 检查源目录是否存在
     if not os.path.exists(source_path):
@@ -31,64 +332,18 @@ def rename_files_sequentially(source_path, prefix="", start_number=1, digits=4,
             print(msg)
     
     # 获取目录中的所有文件
-    source = Path(source_path)
-    files = []
-    
-    for file_path in source.iterdir():
-        if file_path.is_file():
-            # 如果指定了扩展名过滤器，则只添加匹配的文件
-            if extension_filter is None or file_path.suffix.lower() in [ext.lower() for ext in extension_filter]:
-                files.append(file_path)
+    files = _list_rename_files(source_path, extension_filter)
     
-    # 按文件名排序，确保重命名的一致性
-    files.sort()
-    
-    # 预先检查是否有重命名冲突
-    new_names = set()
-    conflicts = []
+    # 计算新文件名
+    new_filenames = []
     for i, file_path in enumerate(files):
         number = start_number + i
         formatted_number = str(number).zfill(digits)
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        if new_filename in new_names:
-            conflicts.append((file_path.name, new_filename))
-        new_names.add(new_filename)
-    
-    if conflicts:
-        _print("警告：以下文件重命名会导致冲突:")
-        for old_name, new_name in conflicts:
-            _print(f"  {old_name} -> {new_name}")
-        response = input("是否继续重命名? (y/N): ")
-        if response.lower() != 'y':
-            _print("重命名操作已取消")
-            return False
+        new_filenames.append(f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}")
     
-    # 重命名文件
-    renamed_count = 0
-    for i, file_path in enumerate(files):
-        # 计算新文件名
-        number = start_number + i
-        formatted_number = str(number).zfill(digits)
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        new_file_path = file_path.parent / new_filename
-        
-        # 重命名文件
-        try:
-            # 检查目标文件是否已存在
-            if new_file_path.exists() and new_file_path != file_path:
-                _print(f"警告：文件 {new_filename} 已存在，跳过 {file_path.name}")
-                continue
-                
-            file_path.rename(new_file_path)
-            _print(f"已重命名: {file_path.name} -> {new_filename}")
-            renamed_count += 1
-        except Exception as e:
-            _print(f"重命名文件失败 {file_path.name}: {str(e)}")
-    
-    _print(f"成功重命名 {renamed_count} 个文件")
-    return True
+    return _rename_with_plan(source_path, files, new_filenames, _print, conflict_policy, dry_run, max_workers)
 
-def rename_files_with_keyword_pattern(source_path, keywords, prefix="", start_number=1, digits=4, extension_filter=None, output_callback=None):
+def rename_files_with_keyword_pattern(source_path, keywords, prefix="", start_number=1, digits=4, extension_filter=None, output_callback=None, conflict_policy="abort", dry_run=False, max_workers=RENAME_WORKERS):
     """
     根据关键词列表对文件进行重命名，关键词来自预定义列表
     
@@ -100,6 +355,9 @@ def rename_files_with_keyword_pattern(source_path, keywords, prefix="", start_nu
         digits (int): 编号位数，默认为4位（如0001）
         extension_filter (list): 文件扩展名过滤器，只重命名指定类型的文件，如['.txt', '.pdf']，默认为None表示所有文件
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        conflict_policy (str): 冲突处理方式 abort / skip / auto_suffix / overwrite，默认 abort（有冲突时不执行）
+        dry_run (bool): 为True时只生成计划并返回 plan_as_data 的结果，不修改任何文件
+        max_workers (int): 并发执行重命名的线程数，默认为 RENAME_WORKERS
     """
     def _print(msg):
         """内部打印函数，支持GUI输出"""
@@ -113,50 +371,10 @@ def rename_files_with_keyword_pattern(source_path, keywords, prefix="", start_nu
         raise FileNotFoundError(f"源目录 {source_path} 不存在")
     
     # 获取目录中的所有文件
-    source = Path(source_path)
-    files = []
+    files = _list_rename_files(source_path, extension_filter)
     
-    for file_path in source.iterdir():
-        if file_path.is_file():
-            # 如果指定了扩展名过滤器，则只添加匹配的文件
-            if extension_filter is None or file_path.suffix.lower() in [ext.lower() for ext in extension_filter]:
-                files.append(file_path)
-    
-    # 按文件名排序，确保重命名的一致性
-    files.sort()
-    
-    # 预先检查是否有重命名冲突
-    new_names = set()
-    conflicts = []
-    for i, file_path in enumerate(files):
-        # 确定使用的关键词
-        keyword = ""
-        if i < len(keywords):
-            keyword = keywords[i]
-        else:
-            # 如果文件数超过关键词数，使用默认编号
-            keyword = f"file_{i+1}"
-        
-        # 计算新文件名
-        number = start_number + i
-        formatted_number = str(number).zfill(digits)
-        keyword_part = f"_{keyword}" if keyword else ""
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        if new_filename in new_names:
-            conflicts.append((file_path.name, new_filename))
-        new_names.add(new_filename)
-    
-    if conflicts:
-        _print("警告：以下文件重命名会导致冲突:")
-        for old_name, new_name in conflicts:
-            _print(f"  {old_name} -> {new_name}")
-        response = input("是否继续重命名? (y/N): ")
-        if response.lower() != 'y':
-            _print("重命名操作已取消")
-            return False
-    
-    # 重命名文件
-    renamed_count = 0
+    # 计算新文件名
+    new_filenames = []
     for i, file_path in enumerate(files):
         # 确定使用的关键词
         keyword = ""
@@ -166,30 +384,14 @@ def rename_files_with_keyword_pattern(source_path, keywords, prefix="", start_nu
             # 如果文件数超过关键词数，使用默认编号
             keyword = f"file_{i+1}"
         
-        # 计算新文件名
         number = start_number + i
         formatted_number = str(number).zfill(digits)
         keyword_part = f"_{keyword}" if keyword else ""
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        new_file_path = file_path.parent / new_filename
-        
-        # 重命名文件
-        try:
-            # 检查目标文件是否已存在
-            if new_file_path.exists() and new_file_path != file_path:
-                _print(f"警告：文件 {new_filename} 已存在，跳过 {file_path.name}")
-                continue
-                
-            file_path.rename(new_file_path)
-            _print(f"已重命名: {file_path.name} -> {new_filename}")
-            renamed_count += 1
-        except Exception as e:
-            _print(f"重命名文件失败 {file_path.name}: {str(e)}")
+        new_filenames.append(f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}")
     
-    _print(f"成功重命名 {renamed_count} 个文件")
-    return True
+    return _rename_with_plan(source_path, files, new_filenames, _print, conflict_policy, dry_run, max_workers)
 
-def rename_files_extract_keyword(source_path, prefix="", start_number=1, digits=4, keyword_patterns=None, extension_filter=None, output_callback=None):
+def rename_files_extract_keyword(source_path, prefix="", start_number=1, digits=4, keyword_patterns=None, extension_filter=None, output_callback=None, conflict_policy="abort", dry_run=False, max_workers=RENAME_WORKERS):
     """
     从文件名中提取关键词并用于重命名
     
@@ -201,6 +403,9 @@ def rename_files_extract_keyword(source_path, prefix="", start_number=1, digits=
         keyword_patterns (list): 关键词模式列表，用于从文件名中提取关键词
         extension_filter (list): 文件扩展名过滤器，只重命名指定类型的文件，如['.txt', '.pdf']，默认为None表示所有文件
         output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        conflict_policy (str): 冲突处理方式 abort / skip / auto_suffix / overwrite，默认 abort（有冲突时不执行）
+        dry_run (bool): 为True时只生成计划并返回 plan_as_data 的结果，不修改任何文件
+        max_workers (int): 并发执行重命名的线程数，默认为 RENAME_WORKERS
     """
     def _print(msg):
         """内部打印函数，支持GUI输出"""
@@ -214,21 +419,10 @@ def rename_files_extract_keyword(source_path, prefix="", start_number=1, digits=
         raise FileNotFoundError(f"源目录 {source_path} 不存在")
     
     # 获取目录中的所有文件
-    source = Path(source_path)
-    files = []
-    
-    for file_path in source.iterdir():
-        if file_path.is_file():
-            # 如果指定了扩展名过滤器，则只添加匹配的文件
-            if extension_filter is None or file_path.suffix.lower() in [ext.lower() for ext in extension_filter]:
-                files.append(file_path)
-    
-    # 按文件名排序，确保重命名的一致性
-    files.sort()
+    files = _list_rename_files(source_path, extension_filter)
     
-    # 预先检查是否有重命名冲突
-    new_names = set()
-    conflicts = []
+    # 计算新文件名
+    new_filenames = []
     for i, file_path in enumerate(files):
         # 从文件名中提取关键词
         keyword = ""
@@ -244,63 +438,184 @@ def rename_files_extract_keyword(source_path, prefix="", start_number=1, digits=
         if not keyword:
             keyword = filename_without_ext
         
-        # 计算新文件名
         number = start_number + i
         formatted_number = str(number).zfill(digits)
         keyword_part = f"_{keyword}" if keyword else ""
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        if new_filename in new_names:
-            conflicts.append((file_path.name, new_filename))
-        new_names.add(new_filename)
+        new_filenames.append(f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}")
     
-    if conflicts:
-        _print("警告：以下文件重命名会导致冲突:")
-        for old_name, new_name in conflicts:
-            _print(f"  {old_name} -> {new_name}")
-        response = input("是否继续重命名? (y/N): ")
-        if response.lower() != 'y':
-            _print("重命名操作已取消")
-            return False
+    return _rename_with_plan(source_path, files, new_filenames, _print, conflict_policy, dry_run, max_workers)
+
+class NameTemplate:
+    """
+    命名模板，如 "{prefix}{n:04d}_{mtime:%Y%m%d}_{excel:B}"，每批只编译一次
     
-    # 重命名文件
-    renamed_count = 0
-    for i, file_path in enumerate(files):
-        # 从文件名中提取关键词
-        keyword = ""
-        filename_without_ext = file_path.stem
-        
-        if keyword_patterns:
-            for pattern in keyword_patterns:
-                if pattern in filename_without_ext:
-                    keyword = pattern
-                    break
-        
-        # 如果没有匹配的关键词，则使用文件名的一部分
-        if not keyword:
-            keyword = filename_without_ext
-        
-        # 计算新文件名
-        number = start_number + i
-        formatted_number = str(number).zfill(digits)
-        keyword_part = f"_{keyword}" if keyword else ""
-        new_filename = f"{prefix}{formatted_number}{keyword_part}{file_path.suffix}"
-        new_file_path = file_path.parent / new_filename
+    可用字段: prefix 前缀, n 序号, name 原文件名（不含扩展名）, ext 原扩展名（含点）,
+    size 文件大小, mtime 修改时间, ctime 创建时间（均可用 strftime 格式）, excel:列 映射表中该列的值（列字母或表头，默认 B）
+    ctime 取 st_birthtime（macOS 等）或 Windows 的 st_ctime；Linux 的 os.stat 没有创建时间，此时为元数据最后变更时间
+    模板中没有 {ext} 时自动保留原扩展名
+    """
+    def __init__(self, template):
+        self.template = template
+        self.fields = set()
+        self.excel_columns = []
+        self._parts = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            if field_name is None:
+                self._parts.append((literal, None, ""))
+                continue
+            if field_name not in _TEMPLATE_FIELDS:
+                raise ValueError(f"命名模板中不支持的字段: {{{field_name}}}，可用字段: {', '.join(_TEMPLATE_FIELDS)}")
+            if conversion or "{" in format_spec:
+                raise ValueError(f"命名模板字段 {{{field_name}}} 不支持转换或嵌套格式")
+            self.fields.add(field_name)
+            if field_name == "excel":
+                column = format_spec.strip() or "B"
+                if column not in self.excel_columns:
+                    self.excel_columns.append(column)
+                self._parts.append((literal, f"excel:{column}", ""))
+            else:
+                self._parts.append((literal, field_name, format_spec))
         
-        # 重命名文件
+        # 用示例值渲染一次，格式错误（如 {n:%Y}）在处理任何文件之前暴露
+        sample = {"prefix": "", "n": 1, "name": "", "ext": "", "size": 0,
+                  "mtime": datetime.now(), "ctime": datetime.now()}
+        sample.update({f"excel:{column}": "" for column in self.excel_columns})
         try:
-            # 检查目标文件是否已存在
-            if new_file_path.exists() and new_file_path != file_path:
-                _print(f"警告：文件 {new_filename} 已存在，跳过 {file_path.name}")
+            self.render(sample)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"命名模板格式错误 {template}: {str(e)}")
+    
+    def render(self, values):
+        """按字段值生成文件名"""
+        parts = []
+        for literal, field_name, format_spec in self._parts:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(format(values[field_name], format_spec))
+        return "".join(parts)
+
+def _column_index(columns, column):
+    """把列字母（A、B、AA...）或表头名称解析为列位置"""
+    if column in columns:
+        return columns.index(column)
+    if column.isascii() and column.isalpha():
+        index = 0
+        for char in column.upper():
+            index = index * 26 + ord(char) - ord("A") + 1
+        if index <= len(columns):
+            return index - 1
+    raise ValueError(f"映射表中没有列 {column}")
+
+def load_rename_mapping(mapping_file, excel_columns, mapping_by="name"):
+    """
+    读取映射表（每批只读取一次）
+    
+    Args:
+        mapping_file (str): 映射表Excel文件路径，第一行为表头
+        excel_columns (list): 模板中用到的列（列字母或表头）
+        mapping_by (str): 'name' 按第一列的原文件名匹配（可含或不含扩展名），'order' 按行顺序对应排序后的文件
+    
+    Returns:
+        dict 或 list: mapping_by 为 'name' 时为 {原文件名: {"excel:列": 值}}，为 'order' 时为按行排列的列表
+    """
+    if mapping_by not in ("name", "order"):
+        raise ValueError(f"不支持的映射方式: {mapping_by}")
+    df = pd.read_excel(mapping_file, dtype=str, keep_default_na=False)
+    columns = [str(column) for column in df.columns]
+    indexes = [(f"excel:{column}", _column_index(columns, column)) for column in excel_columns]
+    rows = []
+    for row in df.itertuples(index=False, name=None):
+        rows.append((str(row[0]).strip() if row else "", {key: str(row[index]).strip() for key, index in indexes}))
+    if mapping_by == "order":
+        return [values for _, values in rows]
+    mapping = {}
+    for key, values in rows:
+        if key:
+            mapping.setdefault(key, values)
+    return mapping
+
+def rename_files_by_template(source_path, template, prefix="", start_number=1, mapping_file=None, mapping_by="name", extension_filter=None, output_callback=None, conflict_policy="abort", dry_run=False, max_workers=RENAME_WORKERS):
+    """
+    按命名模板对文件进行批量重命名，可从映射表中读取新名称
+    
+    Args:
+        source_path (str): 源文件目录路径
+        template (str): 命名模板，如 "{prefix}{n:04d}_{mtime:%Y%m%d}_{excel:B}"，字段说明见 NameTemplate
+        prefix (str): 模板中 {prefix} 的值，默认为空
+        start_number (int): 模板中 {n} 的起始值，默认为1
+        mapping_file (str): 映射表Excel文件路径，模板中使用 {excel:列} 时必须提供
+        mapping_by (str): 映射方式，'name' 按第一列的原文件名匹配，'order' 按行顺序，默认为 'name'
+        extension_filter (list): 文件扩展名过滤器，只重命名指定类型的文件，如['.txt', '.pdf']，默认为None表示所有文件
+        output_callback (function): 输出回调函数，用于将日志信息传递给GUI
+        conflict_policy (str): 冲突处理方式 abort / skip / auto_suffix / overwrite，默认 abort（有冲突时不执行）
+        dry_run (bool): 为True时只生成计划并返回 plan_as_data 的结果，不修改任何文件
+        max_workers (int): 并发执行重命名的线程数，默认为 RENAME_WORKERS
+    """
+    def _print(msg):
+        """内部打印函数，支持GUI输出"""
+        if output_callback:
+            output_callback(msg)
+        else:
+            print(msg)
+    
+    # 检查源目录是否存在
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"源目录 {source_path} 不存在")
+    
+    # 模板和映射表在处理文件之前各解析一次
+    name_template = NameTemplate(template)
+    mapping = None
+    if "excel" in name_template.fields:
+        if not mapping_file:
+            raise ValueError("命名模板中使用了 {excel:列}，请提供映射表")
+        mapping = load_rename_mapping(mapping_file, name_template.excel_columns, mapping_by)
+    
+    # 获取目录中的所有文件，需要时在同一次目录扫描中取得文件属性
+    with_stat = bool(name_template.fields & _STAT_FIELDS)
+    entries = _list_rename_files(source_path, extension_filter, with_stat=with_stat)
+    
+    files = []
+    new_filenames = []
+    unmapped = 0
+    empty = 0
+    for i, entry in enumerate(entries):
+        file_path, stat_result = entry if with_stat else (entry, None)
+        values = {"prefix": prefix, "n": start_number + i, "name": file_path.stem, "ext": file_path.suffix}
+        if stat_result is not None:
+            values["size"] = stat_result.st_size
+            values["mtime"] = datetime.fromtimestamp(stat_result.st_mtime)
+            values["ctime"] = datetime.fromtimestamp(_creation_time(stat_result))
+        if mapping is not None:
+            if mapping_by == "order":
+                row = mapping[i] if i < len(mapping) else None
+            else:
+                row = mapping.get(file_path.name) or mapping.get(file_path.stem)
+            if row is None or not all(row.values()):
+                # 映射表中没有对应行或对应单元格为空的文件保持原名
+                unmapped += 1
+                files.append(file_path)
+                new_filenames.append(file_path.name)
                 continue
-                
-            file_path.rename(new_file_path)
-            _print(f"已重命名: {file_path.name} -> {new_filename}")
-            renamed_count += 1
-        except Exception as e:
-            _print(f"重命名文件失败 {file_path.name}: {str(e)}")
+            values.update(row)
+        
+        # 先检查不含扩展名的部分，避免生成只有扩展名的隐藏文件名（如 ".txt"）
+        if "ext" in name_template.fields:
+            new_filename = name_template.render(values).translate(_UNSAFE_NAME_CHARS).strip()
+            stem = name_template.render(dict(values, ext="")).translate(_UNSAFE_NAME_CHARS).strip()
+        else:
+            stem = name_template.render(values).translate(_UNSAFE_NAME_CHARS).strip()
+            new_filename = stem + file_path.suffix
+        if not stem.strip("."):
+            empty += 1
+            new_filename = file_path.name
+        files.append(file_path)
+        new_filenames.append(new_filename)
     
-    _print(f"成功重命名 {renamed_count} 个文件")
-    return True
+    if unmapped:
+        _print(f"警告：{unmapped} 个文件在映射表中没有对应的行或对应单元格为空，保持原名")
+    if empty:
+        _print(f"警告：{empty} 个文件按模板生成的名称为空，保持原名")
+    return _rename_with_plan(source_path, files, new_filenames, _print, conflict_policy, dry_run, max_workers)
 
 # 示例用法
 if __name__ == "__main__":
@@ -314,4 +629,7 @@ if __name__ == "__main__":
     # 示例3: 从文件名中提取关键词
     # keyword_patterns = ['财经', '政治', '学习', '美国', '虚拟经济', '外交']
     # rename_files_extract_keyword("./test_files", digits=4, keyword_patterns=keyword_patterns)
+    
+    # 示例4: 按命名模板重命名，新名称取自映射表第B列（第一列为原文件名）
+    # rename_files_by_template("./test_files", "{prefix}{n:04d}_{mtime:%Y%m%d}_{excel:B}", prefix="报告_", mapping_file="./映射表.xlsx")
     pass
\ No newline at end of file
@@ -5,16 +5,94 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QLabel, QLineEdit, QListWidget, QGroupBox, 
                              QTabWidget, QCheckBox, QSpinBox, QComboBox,
                              QMessageBox, QProgressBar, QFormLayout, QSizePolicy)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRectF, QPointF
+from PyQt5.QtCore import Qt, QThread, QObject, pyqtSignal, QTimer, QRectF, QPointF
 from PyQt5.QtGui import QFont, QPainter, QColor, QPen
 import pandas as pd
 import math
+import threading
+from datetime import datetime
 from particleanimation import ParticleAnimation
+from progress import ProgressContext, OperationCancelled
+
+# 日志刷新到界面的间隔（毫秒）和日志控件保留的最大行数
+LOG_FLUSH_INTERVAL_MS = 100
+LOG_MAX_LINES = 5000
+# 日志目录中保留的运行日志文件数（每次启动生成一个，超出时删除最早的）
+LOG_KEEP_FILES = 30
+
+
+class LogChannel(QObject):
+    """
+    缓冲日志通道：任意线程写入消息，GUI线程每隔 interval 毫秒把积累的消息作为一个整体追加到日志控件，
+    同时把完整日志（带时间）写入日志文件，避免逐条信号和逐条追加拖慢界面。
+    日志文件所在目录最多保留 keep_files 个 .log 文件（含本次）。
+    工作线程的 output_signal 以 Qt.DirectConnection 连接到 write，消息在工作线程中直接写入缓冲区
+    """
+    def __init__(self, widget, log_path=None, interval=LOG_FLUSH_INTERVAL_MS, max_lines=LOG_MAX_LINES,
+                 keep_files=LOG_KEEP_FILES, parent=None):
+        super().__init__(parent)
+        self.widget = widget
+        self.max_lines = max_lines
+        self.log_path = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._log_file = None
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                self._prune_logs(os.path.dirname(log_path), keep_files - 1)
+                self._log_file = open(log_path, 'a', encoding='utf-8')
+                self.log_path = log_path
+            except OSError as e:
+                self._pending.append(f"无法写入日志文件 {log_path}: {str(e)}")
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(interval)
+    
+    @staticmethod
+    def _prune_logs(log_dir, keep):
+        """删除日志目录中较早的 .log 文件，只保留最近 keep 个（文件名带时间，按名称排序）"""
+        log_files = sorted(name for name in os.listdir(log_dir) if name.endswith('.log'))
+        for name in log_files[:max(len(log_files) - keep, 0)]:
+            try:
+                os.remove(os.path.join(log_dir, name))
+            except OSError:
+                pass
+    
+    def write(self, message):
+        """写入一条消息（线程安全，不直接操作界面）"""
+        with self._lock:
+            self._pending.append(message)
+            if self._log_file is not None:
+                self._log_file.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}\n")
+    
+    def flush(self):
+        """把积累的消息一次性追加到日志控件（只能在GUI线程调用）"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = []
+            if self._log_file is not None:
+                self._log_file.flush()
+        # 控件最多保留 max_lines 行，更早的消息只写入日志文件
+        self.widget.appendPlainText("\n".join(pending[-self.max_lines:]))
+    
+    def close(self):
+        """停止定时刷新并关闭日志文件"""
+        self._timer.stop()
+        self.flush()
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
 
 class WorkerThread(QThread):
     """工作线程类，用于在后台执行耗时操作"""
     output_signal = pyqtSignal(str)
     progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str)
     
     def __init__(self, function, *args, **kwargs):
@@ -22,24 +100,39 @@ class WorkerThread(QThread):
         self.function = function
         self.args = args
         self.kwargs = kwargs
+        # 函数的返回值，finished_signal 发出前写入，供需要结果的调用方（如重命名预览）读取
+        self.result = None
+        # 进度/取消上下文：百分比发送到 progress_signal，"已完成/总量 预计剩余" 文本发送到 status_signal
+        self.progress = ProgressContext(self.progress_signal.emit, self.status_signal.emit)
     
     def run(self):
         try:
             # 为支持输出回调的函数添加output_callback参数
             if self.function.__name__ in ['classify_files', 'classify_files_by_keywords', 'classify_files_by_extension', 
-                                         'merge_excel_files_by_column', 'split_excel_by_column', 'rename_files_sequentially',
+                                         'merge_excel_files_by_column', 'split_excel_by_column', 'rename_files_sequentially', 'rename_files_by_template',
                                          'clean_excel_data', 'process_indication_standardization', 'update_file_comparison',
                                          'process_excel']:
                 self.kwargs['output_callback'] = self._output_callback
+            # 为支持进度/取消上下文的函数添加progress参数
+            if self.function.__name__ in ['classify_files', 'classify_files_by_keywords', 'classify_files_by_extension',
+                                         'split_excel_by_column', 'process_indication_standardization',
+                                         'update_file_comparison', 'process_excel']:
+                self.kwargs['progress'] = self.progress
             
-            result = self.function(*self.args, **self.kwargs)
+            result = self.result = self.function(*self.args, **self.kwargs)
             if result:
                 self.finished_signal.emit(True, "操作成功完成")
             else:
                 self.finished_signal.emit(False, "操作失败")
+        except OperationCancelled:
+            self.finished_signal.emit(False, "操作已取消")
         except Exception as e:
             self.finished_signal.emit(False, f"操作出错: {str(e)}")
     
+    def cancel(self):
+        """请求取消操作（操作在下一次检查时停止）"""
+        self.progress.cancel()
+    
     def _output_callback(self, message):
         """输出回调函数，将消息发送到GUI"""
         self.output_signal.emit(message)
@@ -1,7 +1,7 @@
 import sys
 import os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QPushButton, QTextEdit, QFileDialog, 
+                             QHBoxLayout, QPushButton, QTextEdit, QPlainTextEdit, QFileDialog, 
                              QLabel, QLineEdit, QListWidget, QGroupBox, 
                              QTabWidget, QCheckBox, QSpinBox, QComboBox,
                              QMessageBox, QProgressBar, QFormLayout, QSizePolicy)
@@ -15,17 +15,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from file_classify import classify_files, classify_files_by_keywords, classify_files_by_extension
 from file_Merge import merge_excel_files_by_column
 from file_Splitting import split_excel_by_column
-from file_rename import rename_files_sequentially
+from file_rename import rename_files_sequentially, rename_files_by_template
 from file_clean import clean_excel_data
 from menet_file_normalize import process_indication_standardization
-from menet_update import update_file_comparison
+from menet_update import update_file_comparison, COMPARE_INDEX_FILENAME
 from file_Mulc_sim_match import process_excel
-from lineminister import WorkerThread
+from lineminister import WorkerThread, LogChannel, LOG_MAX_LINES
+from datetime import datetime
 
 
 class AutoExcelGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.worker_thread = None
         self.init_ui()
         
     def init_ui(self):
@@ -122,10 +124,12 @@ class AutoExcelGUI(QMainWindow):
         output_layout.setSpacing(5)
         output_layout.setContentsMargins(10, 10, 10, 10)
         
-        self.output_text = QTextEdit()
+        # 日志控件只保留最近 LOG_MAX_LINES 行，完整日志写入运行日志目录
+        self.output_text = QPlainTextEdit()
         self.output_text.setReadOnly(True)
+        self.output_text.setMaximumBlockCount(LOG_MAX_LINES)
         self.output_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 border: 1px solid #CCCCCC;
                 border-radius: 4px;
                 background-color: #FFFFFF;
@@ -134,6 +138,11 @@ class AutoExcelGUI(QMainWindow):
         self.output_text.setMinimumHeight(120)
         output_layout.addWidget(self.output_text)
         
+        # 工作线程的输出经缓冲日志通道批量刷新到界面
+        log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "运行日志",
+                                f"运行日志_{datetime.now():%Y%m%d_%H%M%S}.log")
+        self.log_channel = LogChannel(self.output_text, log_path, parent=self)
+        
         # 进度条
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -148,7 +157,17 @@ class AutoExcelGUI(QMainWindow):
                 width: 20px;
             }
         """)
-        output_layout.addWidget(self.progress_bar)
+        
+        # 取消按钮（与进度条一起在操作执行期间显示）
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setVisible(False)
+        self.cancel_btn.setStyleSheet("QPushButton { padding: 5px 15px; }")
+        self.cancel_btn.clicked.connect(self.cancel_operation)
+        progress_layout = QHBoxLayout()
+        progress_layout.setSpacing(10)
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.cancel_btn)
+        output_layout.addLayout(progress_layout)
         
         output_group.setLayout(output_layout)
         main_layout.addWidget(output_group)
@@ -355,6 +374,9 @@ class AutoExcelGUI(QMainWindow):
         self.classify_types_edit.setStyleSheet("QLineEdit { padding: 5px; border: 1px solid #CCCCCC; border-radius: 4px; }")
         self.classify_types_edit.setPlaceholderText("输入文件类型，如: word excel pdf (留空为全部)")
         self.type_layout.addWidget(self.classify_types_edit, 1)
+        self.classify_sniff_check = QCheckBox("读取文件头识别类型")
+        self.classify_sniff_check.setToolTip("扩展名缺失或与内容不符的文件按文件头识别真实类型，识别结果缓存在目标目录中")
+        self.type_layout.addWidget(self.classify_sniff_check, 0)
         layout.addLayout(self.type_layout)
         
         # 关键词选择（仅在按关键词分类时启用）
@@ -370,6 +392,55 @@ class AutoExcelGUI(QMainWindow):
         # 连接分类方式选择变化信号
         self.classify_method_combo.currentIndexChanged.connect(self.on_classify_method_changed)
         
+        # 传输方式选择
+        transfer_layout = QHBoxLayout()
+        transfer_layout.setSpacing(10)
+        transfer_layout.addWidget(QLabel("传输方式:"), 0)
+        self.classify_transfer_combo = QComboBox()
+        self.classify_transfer_combo.setStyleSheet("""
+            QComboBox {
+                padding: 5px;
+                border: 1px solid #CCCCCC;
+                border-radius: 4px;
+            }
+            QComboBox::drop-down {
+                border-radius: 4px;
+            }
+        """)
+        self.classify_transfer_combo.addItem("复制", "copy")
+        self.classify_transfer_combo.addItem("移动（同一磁盘直接重命名）", "move")
+        self.classify_transfer_combo.addItem("硬链接（不占用额外空间）", "hardlink")
+        self.classify_transfer_combo.addItem("写时复制克隆（reflink）", "reflink")
+        transfer_layout.addWidget(self.classify_transfer_combo, 1)
+        layout.addLayout(transfer_layout)
+        
+        # 遍历范围：是否递归子目录以及文件过滤
+        self.classify_recursive_check = QCheckBox("递归处理子目录")
+        self.classify_recursive_check.setChecked(False)
+        layout.addWidget(self.classify_recursive_check)
+        
+        self.classify_dedup_check = QCheckBox("跳过内容重复的文件（每份内容只传输一次）")
+        self.classify_dedup_check.setChecked(False)
+        layout.addWidget(self.classify_dedup_check)
+        
+        self.classify_incremental_check = QCheckBox("增量模式（在目标目录保存分类清单，下次只处理新增或修改过的文件）")
+        self.classify_incremental_check.setChecked(False)
+        layout.addWidget(self.classify_incremental_check)
+        
+        filter_layout = QHBoxLayout()
+        filter_layout.setSpacing(10)
+        filter_layout.addWidget(QLabel("包含:"), 0)
+        self.classify_include_edit = QLineEdit()
+        self.classify_include_edit.setStyleSheet("QLineEdit { padding: 5px; border: 1px solid #CCCCCC; border-radius: 4px; }")
+        self.classify_include_edit.setPlaceholderText("只处理匹配的文件，如: *.pdf *.docx (留空为全部)")
+        filter_layout.addWidget(self.classify_include_edit, 1)
+        filter_layout.addWidget(QLabel("排除:"), 0)
+        self.classify_exclude_edit = QLineEdit()
+        self.classify_exclude_edit.setStyleSheet("QLineEdit { padding: 5px; border: 1px solid #CCCCCC; border-radius: 4px; }")
+        self.classify_exclude_edit.setPlaceholderText("跳过匹配的文件和目录，如: *.tmp .git")
+        filter_layout.addWidget(self.classify_exclude_edit, 1)
+        layout.addLayout(filter_layout)
+        
         # 执行按钮
         execute_btn = QPushButton("执行文件分类")
         execute_btn.setStyleSheet("""
@@ -428,10 +499,14 @@ class AutoExcelGUI(QMainWindow):
         - 目标目录：分类后文件存放的目录<br>
         - 分类方式：选择一种分类方式（按文件类型、按关键词、按文件扩展名）<br>
         - 文件类型：指定要分类的文件类型，如word、excel、pdf等，留空则分类所有类型<br>
-        - 关键词：按文件名中包含的关键词进行分类，每个关键词创建一个独立文件夹<br><br>
+        - 关键词：按文件名中包含的关键词进行分类，每个关键词创建一个独立文件夹<br>
+        - 递归处理子目录：勾选后同时分类子目录中的文件（自动跳过目标目录），包含/排除支持 *.pdf 这样的通配符，以空格分隔<br>
+        - 跳过内容重复的文件：先按大小、再按文件内容哈希找出重复文件，每份内容只传输一次，重复文件记录在日志中<br>
+        - 增量模式：目标目录中的“分类清单.sqlite”记录已分类的文件，再次运行时跳过大小和修改时间都没有变化的文件<br>
+        - 传输方式：复制（默认，保留源文件）、移动（同一磁盘上直接重命名，跨磁盘时复制后删除源文件）、硬链接（不复制数据）、写时复制克隆（btrfs/xfs等文件系统支持，否则退化为复制）<br><br>
         
         <b>输出：</b><br>
-        在目标目录下创建不同类型的文件夹，并将文件移动到对应文件夹中<br><br>
+        在目标目录下创建不同类型的文件夹，并将文件按所选传输方式放入对应文件夹中<br><br>
         
         <b>分类方式说明：</b><br>
         1. <b>按文件类型分类</b>：根据文件扩展名将文件分类到对应类型文件夹中<br>
@@ -832,6 +907,83 @@ class AutoExcelGUI(QMainWindow):
         keyword_layout.addWidget(self.rename_keyword_edit, 1)
         layout.addLayout(keyword_layout)
         
+        # 命名模板（填写后按模板重命名，编号位数和关键词不再使用）
+        template_layout = QHBoxLayout()
+        template_layout.setSpacing(10)
+        template_layout.addWidget(QLabel("命名模板:"), 0)
+        self.rename_template_edit = QLineEdit()
+        self.rename_template_edit.setPlaceholderText("可选，如 {prefix}{n:04d}_{mtime:%Y%m%d}_{excel:B}")
+        self.rename_template_edit.setStyleSheet("QLineEdit { padding: 5px; border: 1px solid #CCCCCC; border-radius: 4px; }")
+        template_layout.addWidget(self.rename_template_edit, 1)
+        layout.addLayout(template_layout)
+        
+        # 映射表（模板中使用 {excel:列} 时需要）
+        mapping_layout = QHBoxLayout()
+        mapping_layout.setSpacing(10)
+        mapping_layout.addWidget(QLabel("映射表:"), 0)
+        self.rename_mapping_edit = QLineEdit()
+        self.rename_mapping_edit.setStyleSheet("QLineEdit { padding: 5px; border: 1px solid #CCCCCC; border-radius: 4px; }")
+        mapping_layout.addWidget(self.rename_mapping_edit, 1)
+        mapping_browse_btn = QPushButton("浏览")
+        mapping_browse_btn.setStyleSheet("QPushButton { padding: 5px 15px; }")
+        mapping_browse_btn.clicked.connect(self.browse_rename_mapping)
+        mapping_layout.addWidget(mapping_browse_btn)
+        self.rename_mapping_by_combo = QComboBox()
+        self.rename_mapping_by_combo.setStyleSheet("""
+            QComboBox {
+                padding: 5px;
+                border: 1px solid #CCCCCC;
+                border-radius: 4px;
+            }
+            QComboBox::drop-down {
+                border-radius: 4px;
+            }
+        """)
+        self.rename_mapping_by_combo.addItem("按第一列的原文件名匹配", "name")
+        self.rename_mapping_by_combo.addItem("按行顺序对应", "order")
+        mapping_layout.addWidget(self.rename_mapping_by_combo)
+        layout.addLayout(mapping_layout)
+        
+        # 冲突处理方式（在工作线程中执行，不能再通过控制台询问）
+        conflict_layout = QHBoxLayout()
+        conflict_layout.setSpacing(10)
+        conflict_layout.addWidget(QLabel("重名冲突:"), 0)
+        self.rename_conflict_combo = QComboBox()
+        self.rename_conflict_combo.setStyleSheet("""
+            QComboBox {
+                padding: 5px;
+                border: 1px solid #CCCCCC;
+                border-radius: 4px;
+            }
+            QComboBox::drop-down {
+                border-radius: 4px;
+            }
+        """)
+        self.rename_conflict_combo.addItem("中止（有冲突时不重命名）", "abort")
+        self.rename_conflict_combo.addItem("跳过冲突的文件", "skip")
+        self.rename_conflict_combo.addItem("自动添加序号（如 _1）", "auto_suffix")
+        self.rename_conflict_combo.addItem("覆盖已存在的文件", "overwrite")
+        conflict_layout.addWidget(self.rename_conflict_combo, 1)
+        layout.addLayout(conflict_layout)
+        
+        # 预览按钮
+        preview_btn = QPushButton("预览重命名计划")
+        preview_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 10px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+        preview_btn.clicked.connect(self.preview_rename)
+        layout.addWidget(preview_btn)
+        
         # 执行按钮
         execute_btn = QPushButton("执行重命名")
         execute_btn.setStyleSheet("""
@@ -890,7 +1042,13 @@ class AutoExcelGUI(QMainWindow):
         - 文件名前缀：重命名后的文件前缀<br>
         - 起始编号：重命名开始的编号<br>
         - 编号位数：编号的位数，如4位数就是0001, 0002...<br>
-        - 关键词：添加在序号后的关键词<br><br>
+        - 关键词：添加在序号后的关键词<br>
+        - 重名冲突：新文件名重复或已被其他文件占用时的处理方式<br>
+        - 命名模板（可选）：填写后按模板生成新文件名，可用字段 {prefix} 前缀、{n} 编号、{name} 原文件名、{ext} 扩展名、
+          {size} 文件大小、{mtime} 修改时间、{ctime} 创建时间（如 {mtime:%Y%m%d}；Linux 上取不到创建时间，{ctime} 为文件属性最后变更时间）、{excel:B} 映射表B列的值<br>
+        - 映射表（可选）：第一行为表头，第一列为原文件名，也可以按行顺序与排序后的文件对应<br><br>
+        
+        可先点击"预览重命名计划"查看每个文件的新名称和冲突，确认后再执行<br><br>
         
         <b>输出：</b><br>
         按照指定规则重命名后的文件<br><br>
@@ -1499,6 +1657,16 @@ class AutoExcelGUI(QMainWindow):
         column_group.setLayout(column_layout)
         layout.addWidget(column_group)
         
+        # 增量模式：在输出目录保存标识索引，下次运行只对新标识做模糊匹配
+        self.compare_incremental_check = QCheckBox("增量模式（在输出目录保存标识索引，下次只匹配新增标识）")
+        self.compare_incremental_check.setChecked(False)
+        layout.addWidget(self.compare_incremental_check)
+        
+        # 一对一匹配：避免多条当前记录同时匹配到同一条历史记录
+        self.compare_one_to_one_check = QCheckBox("一对一匹配（每条历史记录最多匹配一条当前记录）")
+        self.compare_one_to_one_check.setChecked(False)
+        layout.addWidget(self.compare_one_to_one_check)
+        
         # 执行按钮
         execute_btn = QPushButton("执行文件对比分析")
         execute_btn.setStyleSheet("""
@@ -1540,9 +1708,11 @@ class AutoExcelGUI(QMainWindow):
         if index == 0:  # 按文件类型分类
             self.type_layout.itemAt(0).widget().show()  # QLabel
             self.type_layout.itemAt(1).widget().show()  # QLineEdit
+            self.type_layout.itemAt(2).widget().show()  # QCheckBox
         else:
             self.type_layout.itemAt(0).widget().hide()  # QLabel
             self.type_layout.itemAt(1).widget().hide()  # QLineEdit
+            self.type_layout.itemAt(2).widget().hide()  # QCheckBox
             
         if index == 1:  # 按关键词分类
             self.keyword_layout.itemAt(0).widget().show()  # QLabel
@@ -1595,6 +1765,11 @@ class AutoExcelGUI(QMainWindow):
         if directory:
             self.rename_source_edit.setText(directory)
             
+    def browse_rename_mapping(self):
+        file, _ = QFileDialog.getOpenFileName(self, "选择映射表", "", "Excel Files (*.xlsx *.xls)")
+        if file:
+            self.rename_mapping_edit.setText(file)
+            
     def browse_clean_source(self):
         file, _ = QFileDialog.getOpenFileName(self, "选择源Excel文件", "", "Excel Files (*.xlsx *.xls)")
         if file:
@@ -1635,6 +1810,14 @@ class AutoExcelGUI(QMainWindow):
         source_path = self.classify_source_edit.text()
         target_path = self.classify_target_edit.text()
         method_index = self.classify_method_combo.currentIndex()
+        transfer_mode = self.classify_transfer_combo.currentData()
+        walk_options = {
+            'recursive': self.classify_recursive_check.isChecked(),
+            'include': self.classify_include_edit.text().split() or None,
+            'exclude': self.classify_exclude_edit.text().split() or None,
+            'dedup': self.classify_dedup_check.isChecked(),
+            'incremental': self.classify_incremental_check.isChecked(),
+        }
         
         if not source_path or not target_path:
             QMessageBox.warning(self, "警告", "请填写源目录和目标目录")
@@ -1647,7 +1830,8 @@ class AutoExcelGUI(QMainWindow):
             
             # 在工作线程中执行
             self.worker_thread = WorkerThread(
-                classify_files, source_path, target_path, selected_types, None, None
+                classify_files, source_path, target_path, selected_types, None, None,
+                transfer_mode=transfer_mode, sniff_content=self.classify_sniff_check.isChecked(), **walk_options
             )
         elif method_index == 1:  # 按关键词分类
             keywords_text = self.classify_keywords_edit.text()
@@ -1658,16 +1842,19 @@ class AutoExcelGUI(QMainWindow):
             
             # 在工作线程中执行关键词分类
             self.worker_thread = WorkerThread(
-                classify_files_by_keywords, source_path, target_path, keywords
+                classify_files_by_keywords, source_path, target_path, keywords,
+                transfer_mode=transfer_mode, **walk_options
             )
         elif method_index == 2:  # 按文件扩展名分类
             # 在工作线程中执行扩展名分类
             self.worker_thread = WorkerThread(
-                classify_files_by_extension, source_path, target_path
+                classify_files_by_extension, source_path, target_path,
+                transfer_mode=transfer_mode, **walk_options
             )
             
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1706,8 +1893,9 @@ class AutoExcelGUI(QMainWindow):
         self.worker_thread = WorkerThread(
             merge_excel_files_by_column, file_paths, match_columns, None, output_path
         )
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1751,31 +1939,109 @@ class AutoExcelGUI(QMainWindow):
                 self.split_excel_by_columns_only, source_file, output_columns, output_dir
             )
             
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
         self.set_ui_disabled(True)
         self.append_output("开始执行文件拆分...")
         
-    def execute_rename(self):
+    def preview_rename(self):
+        source_path = self.rename_source_edit.text()
+        if not source_path:
+            QMessageBox.warning(self, "警告", "请选择源目录")
+            return
+        
+        # 在工作线程中只生成计划（扫描目录、读取映射表，不修改文件），完成后再弹出确认对话框
+        function, args, kwargs = self.get_rename_task()
+        self.worker_thread = WorkerThread(function, *args, dry_run=True, **kwargs)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
+        self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
+        self.worker_thread.finished_signal.connect(self.on_rename_preview_finished)
+        self.worker_thread.start()
+        
+        self.set_ui_disabled(True)
+        self.append_output("正在生成重命名计划...")
+        
+    def on_rename_preview_finished(self, success, message):
+        # 确认后 execute_rename 会替换 self.worker_thread，先等预览线程的 run() 返回
+        self.worker_thread.wait()
+        self.set_ui_disabled(False)
+        self.log_channel.flush()
+        self.statusBar().showMessage("就绪")
+        # 计划为空列表时 WorkerThread 也报告失败，以返回值区分
+        plan = self.worker_thread.result
+        if plan is None:
+            self.append_output(f"生成重命名计划失败: {message}")
+            QMessageBox.critical(self, "错误", f"生成重命名计划失败: {message}")
+            return
+        if not plan:
+            QMessageBox.information(self, "预览", "目录中没有需要重命名的文件")
+            return
+        
+        action_names = {"rename": "重命名", "overwrite": "覆盖", "unchanged": "不变", "skip": "跳过", "conflict": "冲突"}
+        counts = {}
+        for entry in plan:
+            counts[entry["action"]] = counts.get(entry["action"], 0) + 1
+        summary = "，".join(f"{action_names[action]} {count} 个" for action, count in counts.items())
+        
+        # 详细列表只显示前 preview_limit 条，避免大目录下对话框卡顿
+        preview_limit = 1000
+        lines = []
+        for entry in plan[:preview_limit]:
+            line = f"[{action_names[entry['action']]}] {os.path.basename(entry['source'])} -> {os.path.basename(entry['target'])}"
+            if entry["conflict"]:
+                line += f"（{entry['conflict']}）"
+            lines.append(line)
+        if len(plan) > preview_limit:
+            lines.append(f"... 另有 {len(plan) - preview_limit} 个文件未显示")
+        
+        box = QMessageBox(self)
+        box.setWindowTitle("重命名预览")
+        box.setIcon(QMessageBox.Question)
+        box.setText(f"共 {len(plan)} 个文件：{summary}\n是否按此计划执行重命名？")
+        box.setDetailedText("\n".join(lines))
+        box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        box.setDefaultButton(QMessageBox.No)
+        if box.exec_() == QMessageBox.Yes:
+            self.execute_rename()
+        
+    def get_rename_task(self):
+        """根据界面设置返回 (重命名函数, 位置参数, 关键字参数)，填写了命名模板时按模板重命名"""
         source_path = self.rename_source_edit.text()
         prefix = self.rename_prefix_edit.text()
         start_number = self.rename_start_spin.value()
+        conflict_policy = self.rename_conflict_combo.currentData()
+        template = self.rename_template_edit.text().strip()
+        
+        if template:
+            return rename_files_by_template, (source_path, template, prefix, start_number), {
+                'mapping_file': self.rename_mapping_edit.text().strip() or None,
+                'mapping_by': self.rename_mapping_by_combo.currentData(),
+                'conflict_policy': conflict_policy
+            }
         digits = self.rename_digits_spin.value()
         keyword = self.rename_keyword_edit.text()
+        return rename_files_sequentially, (source_path, prefix, start_number, digits, keyword), {
+            'conflict_policy': conflict_policy
+        }
+        
+    def execute_rename(self):
+        source_path = self.rename_source_edit.text()
         
         if not source_path:
             QMessageBox.warning(self, "警告", "请选择源目录")
             return
             
         # 在工作线程中执行
-        self.worker_thread = WorkerThread(
-            rename_files_sequentially, source_path, prefix, start_number, digits, keyword
-        )
-        self.worker_thread.output_signal.connect(self.append_output)
+        function, args, kwargs = self.get_rename_task()
+        self.worker_thread = WorkerThread(function, *args, **kwargs)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1804,8 +2070,9 @@ class AutoExcelGUI(QMainWindow):
             clean_excel_data, source_file, output_file, clean_symbols, symbols_to_remove, 
             mark_empty, mark_duplicates, clean_internal_spaces, clean_chinese_space, clean_english_punctuation
         )
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1830,8 +2097,9 @@ class AutoExcelGUI(QMainWindow):
             process_indication_standardization, input_file, output_folder, column_index, group_column_index,
             similarity_threshold, edit_distance_threshold, min_text_length
         )
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1860,15 +2128,22 @@ class AutoExcelGUI(QMainWindow):
             QMessageBox.warning(self, "警告", "请填写所有文件路径")
             return
             
+        # 增量模式的标识索引保存在输出文件所在目录
+        index_path = None
+        if self.compare_incremental_check.isChecked():
+            index_path = os.path.join(os.path.dirname(os.path.abspath(output_path)), COMPARE_INDEX_FILENAME)
+            
         # 在工作线程中执行
         self.worker_thread = WorkerThread(
             update_file_comparison, file1_path, file2_path, output_path,
             name_similarity_threshold, text_similarity_threshold,
             file1_drug_col, file1_company_col, file1_status_col, file1_content_col,
-            file2_drug_col, file2_company_col, file2_status_col
+            file2_drug_col, file2_company_col, file2_status_col,
+            index_path=index_path, one_to_one=self.compare_one_to_one_check.isChecked()
         )
-        self.worker_thread.output_signal.connect(self.append_output)
+        self.worker_thread.output_signal.connect(self.log_channel.write, Qt.DirectConnection)
         self.worker_thread.progress_signal.connect(self.update_progress)
+        self.worker_thread.status_signal.connect(self.update_progress_status)
         self.worker_thread.finished_signal.connect(self.on_operation_finished)
         self.worker_thread.start()
         
@@ -1876,13 +2151,25 @@ class AutoExcelGUI(QMainWindow):
         self.append_output("开始执行文件对比分析...")
         
     def append_output(self, text):
-        self.output_text.append(text)
+        self.log_channel.write(text)
         
     def update_progress(self, value):
         self.progress_bar.setValue(value)
         
+    def update_progress_status(self, text):
+        # 在状态栏显示 "已完成/总量 预计剩余时间"
+        self.statusBar().showMessage(text)
+        
+    def cancel_operation(self):
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.worker_thread.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.append_output("正在取消操作...")
+        
     def on_operation_finished(self, success, message):
         self.set_ui_disabled(False)
+        # 先把工作线程剩余的输出刷新到界面，再显示结果
+        self.log_channel.flush()
         if success:
             self.append_output(f"操作成功: {message}")
             QMessageBox.information(self, "成功", message)
@@ -1891,6 +2178,11 @@ class AutoExcelGUI(QMainWindow):
             QMessageBox.critical(self, "失败", message)
         self.statusBar().showMessage("就绪")
         
+    def closeEvent(self, event):
+        # 关闭窗口时把剩余日志写入界面和日志文件
+        self.log_channel.close()
+        super().closeEvent(event)
+        
     def on_clean_internal_spaces_changed(self, state):
         """当清除内部空格选项状态改变时，启用或禁用子选项"""
         enabled = state == Qt.Checked
@@ -1902,7 +2194,11 @@ class AutoExcelGUI(QMainWindow):
             tab = self.centralWidget().layout().itemAt(0).widget().widget(i)
             self.set_widget_disabled(tab, disabled)
             
+        if disabled:
+            self.progress_bar.setValue(0)
         self.progress_bar.setVisible(disabled)
+        self.cancel_btn.setEnabled(disabled)
+        self.cancel_btn.setVisible(disabled)
         
     def set_widget_disabled(self, widget, disabled):
         if hasattr(widget, 'setLayout'):
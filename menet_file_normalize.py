@@ -2,14 +2,17 @@ import pandas as pd
 import os
 import numpy as np
 from collections import OrderedDict
+from functools import lru_cache
 import rapidfuzz
 from rapidfuzz import fuzz, distance
 import re
 import time
+import xlsxwriter
+from progress import ProgressContext
 
 def process_indication_standardization(input_file, output_folder, column_index=3, group_column_index=1, 
                                       similarity_threshold=85, edit_distance_threshold=3, min_text_length=4,
-                                      output_callback=None):
+                                      preprocess_cache_size=100000, output_callback=None, progress=None):
     """
     适应症写法规范化处理函数
     
@@ -21,13 +24,17 @@ def process_indication_standardization(input_file, output_folder, column_index=3
     similarity_threshold: 相似度阈值（默认85）
     edit_distance_threshold: 编辑距离阈值（默认3）
     min_text_length: 最小文本长度（默认4）
+    preprocess_cache_size: 文本预处理LRU缓存容量（默认100000条，整个运行过程共享）
     output_callback: 输出回调函数，用于GUI界面显示日志
+    progress: 进度/取消上下文（ProgressContext），分组归一化时按已处理的分组报告进度
     """
+    progress = progress or ProgressContext()
     
     # 设置参数
     SIMILARITY_THRESHOLD = similarity_threshold
     EDIT_DISTANCE_THRESHOLD = edit_distance_threshold
     MIN_TEXT_LENGTH = min_text_length
+    PREPROCESS_CACHE_SIZE = preprocess_cache_size
     
     # 确保输出目录存在
     os.makedirs(output_folder, exist_ok=True)
@@ -90,30 +97,35 @@ def process_indication_standardization(input_file, output_folder, column_index=3
         
         return text
 
+    # 预处理结果的有界LRU缓存，归一化与比对表构建共用
+    cached_preprocess = lru_cache(maxsize=PREPROCESS_CACHE_SIZE, typed=True)(preprocess_text)
+
     def group_normalize(df, col_group=1, col_target=3):
         """
         在指定分组列内容一致的组内，对目标列进行文本相似度归一化
         只匹配文字内容，忽略标点、空格和换行符的差异
+
+        返回 {分组: {原词: (归一化词, 相似度)}}，未归一化的词相似度为100
         """
         start_time = time.time()
         print_log(f"开始分组文本归一化处理，分组列为: '{df.columns[col_group]}'")
         grouped_maps = {}  # 存储每个组的映射关系
         total_groups = df.iloc[:, col_group].nunique()
         processed_groups = 0
-        preprocess_cache = {}  # 文本预处理结果缓存
         total_mappings = 0  # 记录总归一化条目数
+        progress.start(total_groups, "分组归一化")
         
         # 遍历每个分组
         for group_key, group_df in df.groupby(df.columns[col_group]):
+            progress.check()
             processed_groups += 1
             
+            # 进度显示（节流由 ProgressContext 负责）
+            progress.update(processed_groups)
+            
             # 处理空组
             if group_key is None or pd.isna(group_key):
                 continue
-                
-            # 进度显示
-            if processed_groups % 50 == 0 or processed_groups == total_groups:
-                pass
             
             # 获取组内所有行（保持原始顺序）
             group_rows = group_df.copy()
@@ -135,55 +147,51 @@ def process_indication_standardization(input_file, output_folder, column_index=3
                 
                 # 跳过空值
                 if pd.isna(text):
-                    group_map[text] = text
+                    group_map[text] = (text, 100)
                     continue
                 
                 # 短文本直接保留
                 if len(str(text)) < MIN_TEXT_LENGTH:
-                    group_map[text] = text
+                    group_map[text] = (text, 100)
                     continue
                 
                 # 预处理当前文本（只保留文字内容）
-                if text not in preprocess_cache:
-                    preprocess_cache[text] = preprocess_text(text)
+                processed_text = cached_preprocess(text)
                 
                 # 检查是否已有匹配的标准词
                 matched_standard = None
+                matched_score = 100
                 for std in standards:
                     # 预处理标准词（只保留文字内容）
-                    if std not in preprocess_cache:
-                        preprocess_cache[std] = preprocess_text(std)
+                    processed_std = cached_preprocess(std)
                     
                     # 计算相似度（只基于文字内容）
-                    sim_score = fuzz.token_sort_ratio(
-                        preprocess_cache[text],
-                        preprocess_cache[std]
-                    )
+                    sim_score = fuzz.token_sort_ratio(processed_text, processed_std)
                     
                     # 计算编辑距离（只基于文字内容）
-                    edit_dist = distance.Levenshtein.distance(
-                        preprocess_cache[text],
-                        preprocess_cache[std]
-                    )
+                    edit_dist = distance.Levenshtein.distance(processed_text, processed_std)
                     
                     # 检查是否满足阈值条件
                     if sim_score > SIMILARITY_THRESHOLD and edit_dist <= EDIT_DISTANCE_THRESHOLD:
                         matched_standard = std
+                        matched_score = sim_score
                         break
                 
-                # 处理匹配结果
+                # 处理匹配结果（同时记录相似度，比对表无需再次计算）
                 if matched_standard:
-                    group_map[text] = matched_standard
+                    group_map[text] = (matched_standard, matched_score)
                     total_mappings += 1
                 else:
                     # 没有匹配项，作为新标准词
-                    group_map[text] = text
+                    group_map[text] = (text, 100)
                     standards.append(text)
             
             grouped_maps[group_key] = group_map
         
         print_log(f"\n分组处理完成! 共处理 {len(grouped_maps)} 个分组")
         print_log(f"总共创建 {total_mappings} 条归一化映射")
+        cache_info = cached_preprocess.cache_info()
+        print_log(f"预处理缓存命中 {cache_info.hits} 次 | 缓存条目 {cache_info.currsize}/{cache_info.maxsize}")
         print_log(f"总耗时: {time.time()-start_time:.1f}秒")
         return grouped_maps
 
@@ -288,21 +296,12 @@ def process_indication_standardization(input_file, output_folder, column_index=3
     # 1. 获取分组归一化映射
     grouped_maps = group_normalize(df, col_group=group_column_index, col_target=column_index)
 
-    # 2. 准备归一化比对表
+    # 2. 准备归一化比对表（相似度直接复用归一化阶段的计算结果）
     all_mappings = []
     for group_key, mapping in grouped_maps.items():
-        for orig, norm in mapping.items():
-            # 计算相似度（只基于文字内容）
+        for orig, (norm, similarity) in mapping.items():
             orig_text = str(orig)
             norm_text = str(norm)
-            if orig_text == norm_text:
-                similarity = 100
-            else:
-                # 使用预处理后的文本计算相似度
-                similarity = fuzz.token_sort_ratio(
-                    preprocess_text(orig_text),
-                    preprocess_text(norm_text)
-                )
             all_mappings.append({
                 '分组': group_key,
                 '原词': orig_text,
@@ -332,7 +331,7 @@ def process_indication_standardization(input_file, output_folder, column_index=3
             return orig_text
         
         group_map = grouped_maps[group_key]
-        normalized_text = group_map.get(orig_text, orig_text)
+        normalized_text = group_map[orig_text][0] if orig_text in group_map else orig_text
         
         # 统计变化
         if normalized_text != orig_text:
@@ -361,17 +360,17 @@ def process_indication_standardization(input_file, output_folder, column_index=3
     # 1. 保存归一化比对表（含分组信息）
     normalization_file = os.path.join(output_folder, '分组归一化比对.xlsx')
     try:
-        writer = pd.ExcelWriter(normalization_file, engine='xlsxwriter')
-
-        # 按相似度排序
+        # 按相似度排序，并一次性取出各列为普通列表，避免逐行 .iloc 访问
         normalization_df_sorted = normalization_df.sort_values(by='相似度(%)', ascending=False)
+        group_values = normalization_df_sorted['分组'].tolist()
+        orig_values = normalization_df_sorted['原词'].tolist()
+        norm_values = normalization_df_sorted['归一化词'].tolist()
+        similarity_values = normalization_df_sorted['相似度(%)'].tolist()
+        row_count = len(normalization_df_sorted)
 
-        # 将结果写入Excel
-        normalization_df_sorted.to_excel(writer, sheet_name='分组归一化映射', index=False)
-
-        # 获取workbook和worksheet对象
-        workbook = writer.book
-        worksheet = writer.sheets['分组归一化映射']
+        # constant_memory 模式按行顺序流式写出，内存占用与行数无关
+        workbook = xlsxwriter.Workbook(normalization_file, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('分组归一化映射')
 
         # 设置列宽
         worksheet.set_column('A:A', 20)  # 分组列
@@ -381,40 +380,51 @@ def process_indication_standardization(input_file, output_folder, column_index=3
         # 添加颜色标记
         yellow_format = workbook.add_format({'bg_color': '#FFFF00'})
         normal_format = workbook.add_format()
-        blue_format = workbook.add_format({'bg_color': '#CCFFFF'})
 
-        # 添加分组色标
-        unique_groups = normalization_df['分组'].unique()
-        group_colors = {}
+        # 分组色标：调色板格式只创建一次，每个分组映射到其中之一
         color_palette = ['#FFCCCC', '#CCFFCC', '#CCCCFF', '#FFFFCC', '#FFCCFF', '#CCFFFF']
-        for i, group in enumerate(unique_groups):
-            group_colors[group] = workbook.add_format({'bg_color': color_palette[i % len(color_palette)]})
-
-        # 应用格式
-        for row_idx in range(1, len(normalization_df_sorted) + 1):
-            group_key = normalization_df_sorted.iloc[row_idx - 1]['分组']
-            orig_text = normalization_df_sorted.iloc[row_idx - 1]['原词']
-            norm_text = normalization_df_sorted.iloc[row_idx - 1]['归一化词']
-            
+        palette_formats = [workbook.add_format({'bg_color': color}) for color in color_palette]
+        unique_groups = normalization_df['分组'].unique()
+        group_colors = {group: palette_formats[i % len(palette_formats)] for i, group in enumerate(unique_groups)}
+
+        # 说明文字位于F列前几行，constant_memory 模式下需随对应行一起写出
+        notes = [
+            '说明：',
+            '- 黄色标记表示文本被归一化',
+            '- 相似度从红(0%)到绿(100%)渐变',
+            f'- 分组归一化列: {df.columns[group_column_index]}',
+            f'- 阈值设置: 相似度={SIMILARITY_THRESHOLD}% 编辑距离<={EDIT_DISTANCE_THRESHOLD}',
+            f'- 匹配方式: 只匹配文字内容，忽略标点、空格和换行符',
+        ]
+
+        # 添加标题
+        worksheet.write_row(0, 0, ['分组', '原词', '归一化后的标准词', '相似度 (%)'])
+        worksheet.write(0, 5, notes[0])
+
+        # 按行写出数据
+        for row_idx, (group_key, orig_text, norm_text, similarity) in enumerate(
+                zip(group_values, orig_values, norm_values, similarity_values), start=1):
             # 分组列使用颜色
-            group_format = group_colors.get(group_key, normal_format)
-            worksheet.write(row_idx, 0, group_key, group_format)
-            
+            worksheet.write(row_idx, 0, group_key, group_colors.get(group_key, normal_format))
+
             # 原词列（如果变化则标黄）
-            if orig_text != norm_text:
-                worksheet.write(row_idx, 1, orig_text, yellow_format)
-                worksheet.write(row_idx, 2, norm_text, yellow_format)
-            else:
-                worksheet.write(row_idx, 1, orig_text, normal_format)
-                worksheet.write(row_idx, 2, norm_text, normal_format)
-            
+            text_format = yellow_format if orig_text != norm_text else normal_format
+            worksheet.write_string(row_idx, 1, orig_text, text_format)
+            worksheet.write_string(row_idx, 2, norm_text, text_format)
+
             # 相似度列（数值显示）
-            similarity = normalization_df_sorted.iloc[row_idx - 1]['相似度(%)']
             worksheet.write_number(row_idx, 3, similarity)
 
+            if row_idx < len(notes):
+                worksheet.write(row_idx, 5, notes[row_idx])
+
+        # 数据行数少于说明行数时补写剩余说明
+        for note_idx in range(row_count + 1, len(notes)):
+            worksheet.write(note_idx, 5, notes[note_idx])
+
         # 添加相似度色标
         worksheet.conditional_format(
-            f'D2:D{len(normalization_df_sorted)+1}', 
+            f'D2:D{row_count+1}', 
             {
                 'type': '2_color_scale',
                 'min_value': 0,
@@ -426,24 +436,10 @@ def process_indication_standardization(input_file, output_folder, column_index=3
             }
         )
 
-        # 添加标题
-        worksheet.write('A1', '分组')
-        worksheet.write('B1', '原词')
-        worksheet.write('C1', '归一化后的标准词')
-        worksheet.write('D1', '相似度 (%)')
-
-        # 添加说明
-        worksheet.write('F1', '说明：')
-        worksheet.write('F2', '- 黄色标记表示文本被归一化')
-        worksheet.write('F3', '- 相似度从红(0%)到绿(100%)渐变')
-        worksheet.write('F4', f'- 分组归一化列: {df.columns[group_column_index]}')
-        worksheet.write('F5', f'- 阈值设置: 相似度={SIMILARITY_THRESHOLD}% 编辑距离<={EDIT_DISTANCE_THRESHOLD}')
-        worksheet.write('F6', f'- 匹配方式: 只匹配文字内容，忽略标点、空格和换行符')
-
         # 冻结首行
         worksheet.freeze_panes(1, 0)
 
-        writer.close()
+        workbook.close()
         print_log(f"分组归一化比对表已保存到: {normalization_file}")
     except Exception as e:
         print_log(f"保存分组归一化比对表失败: {str(e)}")
@@ -1,17 +1,445 @@
 import pandas as pd
-import difflib
+import numpy as np
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
 from rapidfuzz import fuzz, process
-from openpyxl import load_workbook
+from rapidfuzz.distance import Indel
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
 import os
+import sqlite3
 import time
+from contextlib import closing
+from progress import ProgressContext
+
+# 文本规范化转换表：去掉空格，全角括号转半角
+_NORMALIZE_TABLE = str.maketrans({" ": None, "（": "(", "）": ")"})
+
+# 空字符串在倒排表中的占位字符（空串只与空串相似度为100）
+_EMPTY_TOKEN = ("", -1)
+
+# 批量打分时单个相似度矩阵的最大单元数（float64，约16MB），用于控制分块行数
+MATCH_TILE_CELLS = 2_000_000
+
+# 文件2单元格数（行数×列数）不超过该值时按原文件修改后保存，保留样式、数字格式、列宽、合并单元格和其他工作表；
+# 超过时改为流式读写以控制内存，结果文件只保留单元格的值
+STYLED_OUTPUT_MAX_CELLS = 1_000_000
+
+# 增量模式标识索引库的默认文件名
+COMPARE_INDEX_FILENAME = "一致性评价标识索引.sqlite"
+
+# 标识索引库的结构版本（PRAGMA user_version），与库中记录不一致时清空重建
+IDENTITY_STORE_VERSION = 1
+
+# 评审状态相似度缓存容量（状态取值来自有限词表，按 (状态1, 状态2) 缓存）
+STATUS_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=STATUS_CACHE_SIZE)
+def _status_similarity(text1, text2):
+    """
+    两个状态文本的相似度（0-1）
+
+    Indel.normalized_similarity = 2*LCS/(len1+len2)，与 difflib.SequenceMatcher.ratio()
+    的 2*M/(len1+len2) 同一量纲，可直接与 TEXT_SIM_THRESHOLD 比较；
+    LCS 不小于 difflib 找到的匹配字符数 M，短状态文本两者通常完全相同。
+    """
+    return Indel.normalized_similarity(text1, text2)
+
+
+def _normalize_column(series):
+    """文本列规范化处理（向量化）：去首尾空白后按转换表替换"""
+    return series.astype(str).str.strip().str.translate(_NORMALIZE_TABLE)
+
+
+def _char_tokens(text):
+    """将字符串拆成 (字符, 第几次出现) 元素，使字符多重集合可以按集合求交"""
+    if not text:
+        return [_EMPTY_TOKEN]
+    seen = defaultdict(int)
+    tokens = []
+    for ch in text:
+        tokens.append((ch, seen[ch]))
+        seen[ch] += 1
+    return tokens
+
+
+class IdentityIndex:
+    """
+    file1 身份标识（药物、企业名称）的模糊匹配索引
+
+    药物、企业平均相似度 >= 阈值T 时，两项各自的 fuzz.ratio 都不低于 2T-100。
+    fuzz.ratio >= r 又要求两个字符串共享的字符数至少为较短一方长度的 r/(2-r) 倍，
+    因此按全局稀有度排序后，只需用每个字符串最稀有的若干字符（前缀）建立倒排表，
+    两项候选集求交即可得到不漏召回的候选行，再对候选行批量打分。
+    """
+
+    def __init__(self, drugs, companies, threshold):
+        self.drugs = np.array(drugs, dtype=object)
+        self.companies = np.array(companies, dtype=object)
+        self.threshold = threshold
+        # 单项相似度下限：低于它时平均相似度不可能达到阈值（留出浮点误差余量）
+        self.field_cutoff = max(0.0, 2 * threshold - 100 - 1e-6)
+        self._all_positions = np.arange(len(self.drugs))
+        if self.field_cutoff > 0:
+            self._drug_index = self._build_field_index(self.drugs)
+            self._company_index = self._build_field_index(self.companies)
+
+    def _prefix_length(self, token_count):
+        """满足单项相似度下限时必须命中的前缀长度"""
+        r = self.field_cutoff / 100
+        min_overlap = max(1, math.ceil(token_count * r / (2 - r)))
+        return max(1, token_count - min_overlap + 1)
+
+    def _prefix(self, text, frequency):
+        tokens = _char_tokens(text)
+        tokens.sort(key=lambda token: (frequency.get(token, 0), token))
+        return tokens[:self._prefix_length(len(tokens))]
+
+    def _build_field_index(self, values):
+        frequency = Counter()
+        for value in values:
+            frequency.update(_char_tokens(value))
+        postings = defaultdict(list)
+        for position, value in enumerate(values):
+            for token in self._prefix(value, frequency):
+                postings[token].append(position)
+        postings = {token: np.array(positions) for token, positions in postings.items()}
+        return frequency, postings
+
+    def _field_candidates(self, text, field_index):
+        """返回命中前缀倒排表的位置掩码"""
+        frequency, postings = field_index
+        mask = np.zeros(len(self.drugs), dtype=bool)
+        for token in self._prefix(text, frequency):
+            if token in postings:
+                mask[postings[token]] = True
+        return mask
+
+    def candidates(self, drug, company):
+        """返回可能达到阈值的 file1 标识位置（升序，保持原有遍历顺序）"""
+        if self.field_cutoff <= 0:
+            return self._all_positions
+        drug_mask = self._field_candidates(drug, self._drug_index)
+        if not drug_mask.any():
+            return self._all_positions[:0]
+        return np.flatnonzero(drug_mask & self._field_candidates(company, self._company_index))
+
+    def _score_tile(self, drugs, companies, positions):
+        """对一组查询与候选列批量计算平均相似度矩阵，不满足阈值处置为-1"""
+        drug_scores = process.cdist(drugs, self.drugs[positions], scorer=fuzz.ratio, dtype=np.float64,
+                                    score_cutoff=self.field_cutoff, workers=-1)
+        company_scores = process.cdist(companies, self.companies[positions], scorer=fuzz.ratio, dtype=np.float64,
+                                       score_cutoff=self.field_cutoff, workers=-1)
+        avg_scores = (drug_scores + company_scores) / 2
+        valid = (avg_scores >= self.threshold) & (avg_scores > 0)
+        return np.where(valid, avg_scores, -1)
+
+    def _iter_scored_tiles(self, drugs, companies, progress=None):
+        """
+        按行分块批量打分，逐块产出 (查询行号数组, 候选标识位置数组, 平均相似度矩阵)
+
+        每块只对块内候选的并集打分（候选过滤不会漏掉达到阈值的组合，
+        因此并集中的多余列不影响结果），矩阵大小受 MATCH_TILE_CELLS 约束。
+        提供 progress 时每块打分前检查是否已请求取消，打分后报告已处理的查询行数。
+        """
+        if len(drugs) == 0 or len(self.drugs) == 0:
+            return
+
+        def score(rows, candidate_lists):
+            if progress is not None:
+                progress.check()
+            positions = np.unique(np.concatenate(candidate_lists))
+            scores = self._score_tile([drugs[i] for i in rows], [companies[i] for i in rows], positions)
+            if progress is not None:
+                progress.update(rows[-1] + 1)
+            return np.asarray(rows), positions, scores
+
+        tile_rows, tile_candidates, tile_width = [], [], 0
+        for i in range(len(drugs)):
+            positions = self.candidates(drugs[i], companies[i])
+            if len(positions) == 0:
+                continue
+            # 候选数之和是并集大小的上界，超过预算时先结算当前分块
+            width = min(tile_width + len(positions), len(self.drugs))
+            if tile_rows and (len(tile_rows) + 1) * width > MATCH_TILE_CELLS:
+                yield score(tile_rows, tile_candidates)
+                tile_rows, tile_candidates, width = [], [], len(positions)
+            tile_rows.append(i)
+            tile_candidates.append(positions)
+            tile_width = width
+        if tile_rows:
+            yield score(tile_rows, tile_candidates)
+
+    def pair_scores(self, drugs, companies, positions):
+        """逐对计算查询与指定标识位置的平均相似度（与批量打分一致），位置为-1或不满足阈值时为-1"""
+        scores = np.full(len(positions), -1.0)
+        for k, position in enumerate(positions):
+            if position < 0:
+                continue
+            drug_score = fuzz.ratio(drugs[k], self.drugs[position], score_cutoff=self.field_cutoff)
+            company_score = fuzz.ratio(companies[k], self.companies[position], score_cutoff=self.field_cutoff)
+            avg_score = (drug_score + company_score) / 2
+            if avg_score >= self.threshold and avg_score > 0:
+                scores[k] = avg_score
+        return scores
+
+    def scored_edges(self, drugs, companies, progress=None):
+        """返回所有达到阈值的稀疏候选边 (查询行号数组, 标识位置数组, 分数数组)"""
+        edge_rows, edge_positions, edge_scores = [], [], []
+        for rows, positions, scores in self._iter_scored_tiles(drugs, companies, progress):
+            row_idx, col_idx = np.nonzero(scores >= 0)
+            edge_rows.append(rows[row_idx])
+            edge_positions.append(positions[col_idx])
+            edge_scores.append(scores[row_idx, col_idx])
+        if not edge_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        return np.concatenate(edge_rows), np.concatenate(edge_positions), np.concatenate(edge_scores)
+
+    def best_matches(self, drugs, companies, progress=None):
+        """
+        批量查找最佳匹配，返回 (标识位置数组, 平均相似度数组)，无匹配时位置为-1、分数为0
+        与逐个比较的写法一致：取平均相似度最高者，相同分数取最先出现的标识
+        """
+        best_positions = np.full(len(drugs), -1, dtype=np.int64)
+        best_scores = np.zeros(len(drugs), dtype=np.float64)
+        for rows, positions, scores in self._iter_scored_tiles(drugs, companies, progress):
+            best = scores.argmax(axis=1)
+            top = scores[np.arange(len(rows)), best]
+            found = top >= 0
+            best_positions[rows[found]] = positions[best[found]]
+            best_scores[rows[found]] = top[found]
+        return best_positions, best_scores
+
+    def one_to_one_matches(self, drugs, companies, excluded_positions=(), progress=None):
+        """
+        全局一对一匹配：每个查询最多匹配一个标识，每个标识也最多被一个查询占用
+
+        只收集达到阈值的 (查询, 标识, 分数) 稀疏候选边，按分数从高到低贪心分配
+        （同分时先查询行号、再标识位置靠前者优先），excluded_positions 中的标识不参与分配。
+        返回值与 best_matches 相同。
+        """
+        edge_rows, edge_positions, edge_scores = self.scored_edges(drugs, companies, progress)
+        return _assign_one_to_one(edge_rows, edge_positions, edge_scores, len(drugs), len(self.drugs),
+                                  excluded_positions)
+
+
+def _assign_one_to_one(edge_rows, edge_positions, edge_scores, query_count, position_count, excluded_positions=()):
+    """
+    按分数从高到低贪心分配候选边（同分时先查询行号、再标识位置靠前者优先），
+    每个查询、每个标识各最多分配一次，excluded_positions 中的标识不参与。返回 (位置数组, 分数数组)
+    """
+    best_positions = np.full(query_count, -1, dtype=np.int64)
+    best_scores = np.zeros(query_count, dtype=np.float64)
+    taken = np.zeros(position_count, dtype=bool)
+    taken[list(excluded_positions)] = True
+    for edge in np.lexsort((edge_positions, edge_rows, -edge_scores)):
+        row, position = edge_rows[edge], edge_positions[edge]
+        if best_positions[row] >= 0 or taken[position]:
+            continue
+        best_positions[row] = position
+        best_scores[row] = edge_scores[edge]
+        taken[position] = True
+    return best_positions, best_scores
+
+
+def _best_per_query(edge_rows, edge_positions, edge_scores, query_count):
+    """每个查询取分数最高的候选边（同分取标识位置靠前者，与 best_matches 一致），返回 (位置数组, 分数数组)"""
+    best_positions = np.full(query_count, -1, dtype=np.int64)
+    best_scores = np.zeros(query_count, dtype=np.float64)
+    if len(edge_rows) == 0:
+        return best_positions, best_scores
+    order = np.lexsort((edge_positions, -edge_scores, edge_rows))
+    sorted_rows = edge_rows[order]
+    first = order[np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]]
+    best_positions[edge_rows[first]] = edge_positions[first]
+    best_scores[edge_rows[first]] = edge_scores[first]
+    return best_positions, best_scores
+
+
+def _reuse_stored_matches(identity_index, drugs, companies, stored_positions, new_positions, progress=None):
+    """
+    复核上次运行的匹配结果
+
+    stored_positions 为上次匹配到的文件1标识在 identity_index 中的位置（上次无匹配为-1），
+    先重新计算与该标识的平均相似度，再只与上次运行之后新增的文件1标识（new_positions）做模糊匹配。
+    返回 (查询行号数组, 标识位置数组, 分数数组, 失效掩码)：候选边由上次的匹配和新增标识的候选组成，
+    每个查询取最优边即与对全部文件1标识做模糊匹配的结果相同；上次匹配到的标识已不满足当前阈值时
+    失效，失效查询不产出候选边，需要重新全量匹配。
+    """
+    stored_positions = np.asarray(stored_positions, dtype=np.int64)
+    stored_scores = identity_index.pair_scores(drugs, companies, stored_positions)
+    stale = (stored_positions >= 0) & (stored_scores < 0)
+    kept = np.flatnonzero(stored_scores >= 0)
+    edge_rows, edge_positions, edge_scores = [kept], [stored_positions[kept]], [stored_scores[kept]]
+    if len(new_positions):
+        new_positions = np.asarray(new_positions, dtype=np.int64)
+        delta_index = IdentityIndex(identity_index.drugs[new_positions].tolist(),
+                                    identity_index.companies[new_positions].tolist(), identity_index.threshold)
+        rows, positions, scores = delta_index.scored_edges(drugs, companies, progress)
+        edge_rows.append(rows)
+        edge_positions.append(new_positions[positions])
+        edge_scores.append(scores)
+    edge_rows, edge_positions, edge_scores = (np.concatenate(edge_rows), np.concatenate(edge_positions),
+                                              np.concatenate(edge_scores))
+    valid = ~stale[edge_rows]
+    return edge_rows[valid], edge_positions[valid], edge_scores[valid], stale
+
+
+def _open_identity_store(index_path):
+    """打开增量模式的标识索引库（SQLite），不存在时建表；结构版本不一致的库只是缓存，清空后重建"""
+    conn = sqlite3.connect(index_path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != IDENTITY_STORE_VERSION:
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            conn.execute(f'DROP TABLE "{table}"')
+        conn.execute(f"PRAGMA user_version = {IDENTITY_STORE_VERSION}")
+    conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_date TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        name_threshold REAL NOT NULL,
+        one_to_one INTEGER NOT NULL)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS identities (
+        run_id INTEGER NOT NULL,
+        identity TEXT NOT NULL,
+        matched_identity TEXT,
+        match_score REAL,
+        PRIMARY KEY (run_id, identity))""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS baseline (
+        run_id INTEGER NOT NULL,
+        identity TEXT NOT NULL,
+        PRIMARY KEY (run_id, identity))""")
+    return conn
+
+
+def load_identity_index(index_path):
+    """
+    读取上次运行持久化的标识索引
+
+    返回 (上次运行日期, {文件2标识: (匹配到的文件1标识或None, 匹配分数或None)}, 上次的文件1标识集合,
+    上次的匹配设置 (名称相似度阈值, 是否一对一))；没有记录时返回 (None, {}, None, None)，
+    上次运行没有保存文件1标识基线时集合为 None（不能复用）
+    """
+    if not os.path.exists(index_path):
+        return None, {}, None, None
+    with closing(_open_identity_store(index_path)) as conn:
+        last_run = conn.execute("SELECT run_id, run_date, name_threshold, one_to_one FROM runs "
+                                "ORDER BY run_id DESC LIMIT 1").fetchone()
+        if last_run is None:
+            return None, {}, None, None
+        run_id, run_date, name_threshold, one_to_one = last_run
+        rows = conn.execute("SELECT identity, matched_identity, match_score FROM identities WHERE run_id = ?",
+                            (run_id,))
+        stored = {identity: (matched, score) for identity, matched, score in rows}
+        baseline = {identity for (identity,) in conn.execute("SELECT identity FROM baseline WHERE run_id = ?",
+                                                             (run_id,))}
+        settings = (name_threshold, bool(one_to_one))
+        return run_date, stored, baseline or None, settings
+
+
+def save_identity_index(index_path, run_date, file_path, records, baseline, settings):
+    """
+    保存本次运行的标识索引，供下次增量对比使用（只保留最近一次运行的明细）
+
+    records: [(文件2标识, 匹配到的文件1标识或None, 匹配分数或None), ...]，未匹配的标识也保存
+    baseline: 本次参与匹配的文件1标识，下次运行据此找出新增的文件1标识
+    settings: 本次的匹配设置 (名称相似度阈值, 是否一对一)
+    """
+    name_threshold, one_to_one = settings
+    with closing(_open_identity_store(index_path)) as conn, conn:
+        run_id = conn.execute("INSERT INTO runs (run_date, file_path, name_threshold, one_to_one) VALUES (?, ?, ?, ?)",
+                              (run_date, os.path.abspath(file_path), name_threshold, int(one_to_one))).lastrowid
+        conn.execute("DELETE FROM identities WHERE run_id < ?", (run_id,))
+        conn.execute("DELETE FROM baseline WHERE run_id < ?", (run_id,))
+        conn.executemany("INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?)",
+                         [(run_id,) + tuple(record) for record in records])
+        conn.executemany("INSERT OR REPLACE INTO baseline VALUES (?, ?)",
+                         [(run_id, identity) for identity in baseline])
+
+
+def _write_styled_result(file2_path, output_path, row_remarks, row_contents, row_fills):
+    """在文件2的活动工作表末尾追加 匹配状态/标准备注 两列并给数据行上色，其余内容与格式原样保存"""
+    wb = load_workbook(file2_path)
+    ws = wb.active
+    max_col = ws.max_column + 1
+    ws.cell(row=1, column=max_col, value="匹配状态")
+    ws.cell(row=1, column=max_col + 1, value="标准备注")
+    for row_idx, remark in enumerate(row_remarks):
+        excel_row = row_idx + 2
+        ws.cell(row=excel_row, column=max_col, value=remark)
+        ws.cell(row=excel_row, column=max_col + 1, value=row_contents[row_idx])
+        # 只对原有列应用颜色，不包括新添加的两列
+        if row_fills[row_idx] is not None:
+            for col in range(1, max_col):
+                ws.cell(row=excel_row, column=col).fill = row_fills[row_idx]
+    wb.save(output_path)
+
+
+def _write_streamed_result(file2_path, output_path, column_count, row_remarks, row_contents, row_fills):
+    """
+    以只读模式流式读取文件2，逐行追加两列新列后以只写模式写出，内存占用不随行数增长
+    只保留活动工作表的单元格值；各行按标题行的列数（column_count）补齐，不依赖文件记录的表格范围
+    """
+    source_wb = load_workbook(file2_path, read_only=True)
+    source_ws = source_wb.active
+    # 文件记录的表格范围可能缺失或有误，按实际单元格读取
+    source_ws.reset_dimensions()
+    result_wb = Workbook(write_only=True)
+    result_ws = result_wb.create_sheet(source_ws.title)
+
+    for excel_row, values in enumerate(source_ws.iter_rows(values_only=True)):
+        values = list(values) + [None] * (column_count - len(values))
+
+        if excel_row == 0:
+            result_ws.append(values + ["匹配状态", "标准备注"])
+            continue
+
+        row_idx = excel_row - 1  # 数据行号（去掉标题行）
+        if row_idx >= len(row_remarks):
+            result_ws.append(values)
+            continue
+
+        # 只对原有列应用颜色，不包括新添加的两列
+        row_color = row_fills[row_idx]
+        if row_color is not None:
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(result_ws, value=value)
+                cell.fill = row_color
+                cells.append(cell)
+            values = cells
+        result_ws.append(values + [row_remarks[row_idx], row_contents[row_idx]])
+
+    source_wb.close()
+    result_wb.save(output_path)
+
 
 def update_file_comparison(file1_path, file2_path, output_path, 
                           name_similarity_threshold=80, text_similarity_threshold=0.4,
                           file1_drug_col=1, file1_company_col=4, file1_status_col=7, file1_content_col=23,
                           file2_drug_col=0, file2_company_col=3, file2_status_col=6,
-                          output_callback=None):
-    """一致性评价进度文件对比更新功能"""
+                          index_path=None, one_to_one=False, output_callback=None, progress=None):
+    """
+    一致性评价进度文件对比更新功能
+
+    index_path: 增量模式的标识索引库路径（SQLite）。指定后每次运行都会保存文件2各标识的
+        匹配结果（包括未匹配）以及参与匹配的文件1标识。下次运行时，未精确匹配、但上次出现过的
+        文件2标识不再与全部文件1标识做模糊匹配：重新计算与上次匹配到的文件1标识的相似度，
+        并只与上次之后新增的文件1标识比较，结果与全量匹配相同；上次匹配到的标识已删除或不再
+        满足阈值时重新全量匹配。若文件1就是上次的文件2（逐期滚动），未变化的标识本来就会精确
+        匹配，索引只能节省反复出现的未匹配或改名记录的模糊匹配。备注中的时间段取自上次运行日期。
+    one_to_one: 模糊匹配采用全局一对一分配。默认每条文件2记录各自取最相似的文件1记录，
+        多条记录可能同时匹配到同一条历史记录；开启后已被精确匹配占用的历史记录不再参与，
+        其余按相似度从高到低贪心分配，未分到的记录视为新增记录。与 index_path 同时使用时，
+        复用的历史匹配作为候选与模糊匹配的候选一起参与贪心分配，候选都被占用的记录再全量匹配，
+        因此结果仍满足一对一，但可能与不使用索引的全量分配略有不同。
+    progress: 进度/取消上下文（ProgressContext），模糊匹配时按已处理的记录报告进度。
+    """
+    progress = progress or ProgressContext()
     
     def _print(msg):
         if output_callback:
@@ -19,13 +447,12 @@ def update_file_comparison(file1_path, file2_path, output_path,
         else:
             print(msg)
     
-    def normalize_text(text):
-        """文本规范化处理"""
-        return str(text).strip().replace(" ", "").replace("（", "(").replace("）", ")")
-
     def calculate_text_similarity(text1, text2):
-        """计算两个文本的相似度（0-1）"""
-        return difflib.SequenceMatcher(None, str(text1), str(text2)).ratio()
+        """计算两个文本的相似度（0-1），相同文本直接返回1"""
+        text1, text2 = str(text1), str(text2)
+        if text1 == text2:
+            return 1.0
+        return _status_similarity(text1, text2)
 
     # ========== 参数配置 ==========
     NAME_SIM_THRESHOLD = name_similarity_threshold  # 名称相似度阈值
@@ -41,16 +468,39 @@ def update_file_comparison(file1_path, file2_path, output_path,
     FILE2_COMPANY_COL = file2_company_col
     FILE2_STATUS_COL = file2_status_col
 
+    # 备注时间段：上次运行日期（增量模式）或历史文件修改日期，至本次运行日期
+    run_date = time.strftime("%Y-%m-%d")
+    match_settings = (float(NAME_SIM_THRESHOLD), bool(one_to_one))
+    last_run_date, stored_matches, baseline, stored_settings = (
+        load_identity_index(index_path) if index_path else (None, {}, None, None))
+    period_start = last_run_date or time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(file1_path)))
+    if index_path:
+        if last_run_date and baseline is None:
+            _print(f"📒 增量模式: {last_run_date} 的标识索引缺少历史标识基线，本次将全量匹配并重建索引")
+        elif last_run_date and stored_settings != match_settings:
+            # 阈值或分配方式变化后上次的结果（尤其是"无匹配"）不再成立
+            baseline = None
+            _print(f"📒 增量模式: {last_run_date} 的标识索引使用了不同的匹配设置，本次将全量匹配并重建索引")
+        elif last_run_date:
+            _print(f"📒 增量模式: 读取 {last_run_date} 的标识索引，共 {len(stored_matches)} 条标识")
+        else:
+            _print("📒 增量模式: 尚无历史标识索引，本次将全量匹配并保存索引")
+
     # ========== 1. 数据准备 ==========
     _print("📂 读取数据文件中...")
     start_time = time.time()
 
     df1 = pd.read_excel(file1_path, dtype=str).fillna("")
     df2 = pd.read_excel(file2_path, dtype=str).fillna("")
+    file2_column_count = len(df2.columns)
 
     # 创建规范化的身份标识
-    df1["标识"] = df1.apply(lambda row: f"{normalize_text(row.iloc[FILE1_DRUG_COL])}|{normalize_text(row.iloc[FILE1_COMPANY_COL])}", axis=1)
-    df2["标识"] = df2.apply(lambda row: f"{normalize_text(row.iloc[FILE2_DRUG_COL])}|{normalize_text(row.iloc[FILE2_COMPANY_COL])}", axis=1)
+    drug1 = _normalize_column(df1.iloc[:, FILE1_DRUG_COL])
+    company1 = _normalize_column(df1.iloc[:, FILE1_COMPANY_COL])
+    drug2 = _normalize_column(df2.iloc[:, FILE2_DRUG_COL])
+    company2 = _normalize_column(df2.iloc[:, FILE2_COMPANY_COL])
+    df1["标识"] = drug1 + "|" + company1
+    df2["标识"] = drug2 + "|" + company2
 
     # ========== 2. 身份标识匹配 ==========
     _print("🔍 正在进行身份标识匹配...")
@@ -58,31 +508,111 @@ def update_file_comparison(file1_path, file2_path, output_path,
     unmatched_data = []
 
     # 构建file1的标识映射
-    file1_ids = {row["标识"]: idx for idx, row in df1.iterrows()}
+    file1_ids = dict(zip(df1["标识"], df1.index))
 
-    for idx2, row2 in df2.iterrows():
-        best_match = None
-        highest_score = 0
-        
-        # 优先尝试精确匹配
-        if row2["标识"] in file1_ids:
-            best_match = file1_ids[row2["标识"]]
-            highest_score = 100
+    # 优先尝试精确匹配
+    file2_ids = df2["标识"].tolist()
+    best_matches = [file1_ids.get(id2) for id2 in file2_ids]
+    highest_scores = [100 if match is not None else 0 for match in best_matches]
+
+    # 文件1标识按首次出现的顺序编号，与模糊匹配索引中的位置一致
+    file1_identities = list(file1_ids)
+    identity_positions = {identity: position for position, identity in enumerate(file1_identities)}
+    file1_rows = list(file1_ids.values())
+
+    # 增量模式：上次出现过的文件2标识复核上次的结果（上次匹配到的文件1标识已删除时重新全量匹配；
+    # 一对一模式下"无匹配"可能只是候选被占用，也重新全量匹配）
+    fuzzy_rows = []
+    reused_rows = []
+    stored_positions = []
+    for i, match in enumerate(best_matches):
+        if match is not None:
+            continue
+        stored = stored_matches.get(file2_ids[i]) if baseline is not None else None
+        if stored is not None and (stored[0] in identity_positions or (stored[0] is None and not one_to_one)):
+            reused_rows.append(i)
+            stored_positions.append(identity_positions[stored[0]] if stored[0] is not None else -1)
+        else:
+            fuzzy_rows.append(i)
+
+    identity_index = None
+    if fuzzy_rows or reused_rows:
+        # 按标识首次出现的顺序建立药物/企业候选索引，模糊匹配只对候选行打分
+        first_occurrence = ~df1["标识"].duplicated()
+        identity_index = IdentityIndex(drug1[first_occurrence].tolist(), company1[first_occurrence].tolist(),
+                                       NAME_SIM_THRESHOLD)
+
+    stale_count = 0
+    reused_edges = None
+    if reused_rows:
+        new_positions = [position for position, identity in enumerate(file1_identities) if identity not in baseline]
+        progress.start(len(reused_rows), "复核历史匹配")
+        edge_rows, edge_positions, edge_scores, stale = _reuse_stored_matches(
+            identity_index, drug2.iloc[reused_rows].tolist(), company2.iloc[reused_rows].tolist(),
+            stored_positions, new_positions, progress)
+        if one_to_one:
+            # 一对一模式下复用的候选边与模糊匹配的候选边一起参与全局分配，行号换算为文件2行号
+            reused_edges = (np.asarray(reused_rows)[edge_rows], edge_positions, edge_scores)
         else:
-            # 模糊匹配
-            for id1, idx1 in file1_ids.items():
-                # 拆分药物名称和企业名称
-                drug2, comp2 = row2["标识"].split("|")
-                drug1, comp1 = id1.split("|")
-                
-                # 分别计算相似度
-                drug_sim = fuzz.ratio(drug1, drug2)
-                comp_sim = fuzz.ratio(comp1, comp2)
-                avg_sim = (drug_sim + comp_sim) / 2
-                
-                if avg_sim > highest_score and avg_sim >= NAME_SIM_THRESHOLD:
-                    highest_score = avg_sim
-                    best_match = idx1
+            positions, scores = _best_per_query(edge_rows, edge_positions, edge_scores, len(reused_rows))
+            for i, position, score in zip(reused_rows, positions, scores):
+                if position >= 0:
+                    best_matches[i] = file1_rows[position]
+                    highest_scores[i] = float(score)
+        fuzzy_rows.extend(i for i, is_stale in zip(reused_rows, stale) if is_stale)
+        fuzzy_rows.sort()
+        stale_count = int(stale.sum())
+        _print(f"📒 复核历史匹配结果 {len(reused_rows) - stale_count} 条"
+               f"（新增文件1标识 {len(new_positions)} 个），{stale_count} 条已失效需重新匹配")
+    reused_count = len(reused_rows) - stale_count
+
+    # 未命中的记录集中做批量模糊匹配（药物与企业相似度取平均）
+    if fuzzy_rows:
+        _print(f"🔍 精确匹配 {len(file2_ids) - len(fuzzy_rows) - reused_count} 条，模糊匹配剩余 {len(fuzzy_rows)} 条...")
+    if one_to_one and (fuzzy_rows or reused_edges is not None):
+        # 已被精确匹配占用的历史记录不再参与分配；复用的记录与模糊匹配的记录按同一贪心规则竞争，
+        # 保证每条历史记录最多被一条记录占用
+        row_positions = {row: position for position, row in enumerate(file1_rows)}
+        claimed = {row_positions[match] for match in best_matches if match is not None}
+        progress.start(len(fuzzy_rows), "模糊匹配")
+        rows, positions, scores = identity_index.scored_edges(
+            drug2.iloc[fuzzy_rows].tolist(), company2.iloc[fuzzy_rows].tolist(), progress)
+        edges = [(np.asarray(fuzzy_rows, dtype=np.int64)[rows], positions, scores)]
+        if reused_edges is not None:
+            edges.append(reused_edges)
+        positions, scores = _assign_one_to_one(*(np.concatenate(part) for part in zip(*edges)),
+                                               len(file2_ids), len(file1_identities), claimed)
+        fuzzy_set = set(fuzzy_rows)
+        query_rows = sorted(fuzzy_set.union(reused_edges[0].tolist() if reused_edges is not None else ()))
+        # 复用的候选都已被其他记录占用时，再与其余未被占用的历史记录做全量匹配
+        retry_rows = [i for i in query_rows if positions[i] < 0 and i not in fuzzy_set]
+        if retry_rows:
+            taken = claimed.union(positions[positions >= 0].tolist())
+            progress.start(len(retry_rows), "一对一补充匹配")
+            positions[retry_rows], scores[retry_rows] = identity_index.one_to_one_matches(
+                drug2.iloc[retry_rows].tolist(), company2.iloc[retry_rows].tolist(), taken, progress)
+        assigned = int((positions[query_rows] >= 0).sum())
+        _print(f"🔗 一对一匹配: 分配 {assigned} 条，其余 {len(query_rows) - assigned} 条无可用历史记录")
+        for i in query_rows:
+            if positions[i] >= 0:
+                best_matches[i] = file1_rows[positions[i]]
+                highest_scores[i] = float(scores[i])
+        progress.finish()
+    elif fuzzy_rows:
+        fuzzy_drugs = drug2.iloc[fuzzy_rows].tolist()
+        fuzzy_companies = company2.iloc[fuzzy_rows].tolist()
+        progress.start(len(fuzzy_rows), "模糊匹配")
+        positions, scores = identity_index.best_matches(fuzzy_drugs, fuzzy_companies, progress)
+        for i, position, score in zip(fuzzy_rows, positions, scores):
+            if position >= 0:
+                best_matches[i] = file1_rows[position]
+                highest_scores[i] = float(score)
+        progress.finish()
+    progress.check()
+
+    for idx2, row2 in df2.iterrows():
+        best_match = best_matches[idx2]
+        highest_score = highest_scores[idx2]
         
         # 处理匹配结果
         if best_match is not None:
@@ -124,8 +654,6 @@ def update_file_comparison(file1_path, file2_path, output_path,
 
     # ========== 3. 结果标记 ==========
     _print("🖌️ 标记结果文件中...")
-    wb = load_workbook(file2_path)
-    ws = wb.active
 
     # 创建样式
     new_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")  # 新增-浅蓝
@@ -133,11 +661,10 @@ def update_file_comparison(file1_path, file2_path, output_path,
     name_changed_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")  # 名称变更-浅绿
     both_changed_fill = PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid")  # 名称+状态变更-橙色
 
-    # 添加两列新列：匹配状态和标准备注
-    max_col = ws.max_column + 1
-    ws.cell(row=1, column=max_col, value="匹配状态")
-    max_col += 1
-    ws.cell(row=1, column=max_col, value="标准备注")
+    # 按file2行预先计算两列新列（匹配状态和标准备注）及整行颜色
+    row_remarks = [None] * len(df2)
+    row_contents = [None] * len(df2)
+    row_fills = [None] * len(df2)
 
     # 初始化统计计数器
     exact_match_count = 0
@@ -147,7 +674,7 @@ def update_file_comparison(file1_path, file2_path, output_path,
 
     # 标记匹配结果
     for match in matched_data:
-        row_idx = match["file2_index"] + 2  # Excel行号（标题行+1）
+        row_idx = match["file2_index"]
         remark_content = ""  # 标准备注列的内容
         row_color = None  # 行的颜色
         
@@ -157,7 +684,7 @@ def update_file_comparison(file1_path, file2_path, output_path,
                 remark = f"状态变更: {match['file1_status']} → {match['file2_status']}"
                 # 整行标记黄色
                 row_color = changed_fill
-                remark_content = "2025-07-23至2025-08-04状态变化"  # 标准备注内容
+                remark_content = f"{period_start}至{run_date}状态变化"  # 标准备注内容
                 status_change_count += 1
             else:
                 remark = "匹配成功"
@@ -185,35 +712,38 @@ def update_file_comparison(file1_path, file2_path, output_path,
                 # 标准备注内容使用匹配状态列的内容
                 remark_content = f"名称变更({change_text})"
         
-        # 写入匹配状态列
-        ws.cell(row=row_idx, column=max_col-1, value=remark)
-        
-        # 写入标准备注列
-        ws.cell(row=row_idx, column=max_col, value=remark_content)
-        
-        # 应用行颜色（如果有）
-        if row_color:
-            for col in range(1, max_col-1):  # 只对原有列应用颜色，不包括新添加的两列
-                ws.cell(row=row_idx, column=col).fill = row_color
+        # 记录匹配状态、标准备注和行颜色（如果有）
+        row_remarks[row_idx] = remark
+        row_contents[row_idx] = remark_content
+        row_fills[row_idx] = row_color
 
-    # 标记未匹配数据（新增记录）
+    # 标记未匹配数据（新增记录），整行标记浅蓝色
     for unmatched in unmatched_data:
-        row_idx = unmatched["file2_index"] + 2
-        remark = "新增记录"
-        
-        # 写入匹配状态列
-        ws.cell(row=row_idx, column=max_col-1, value=remark)
-        
-        # 写入标准备注列
-        remark_content = "2025-07-23后新增记录"
-        ws.cell(row=row_idx, column=max_col, value=remark_content)
-        
-        # 整行标记浅蓝色（不包括新添加的两列）
-        for col in range(1, max_col-1):
-            ws.cell(row=row_idx, column=col).fill = new_fill
+        row_idx = unmatched["file2_index"]
+        row_remarks[row_idx] = "新增记录"
+        row_contents[row_idx] = f"{period_start}后新增记录"
+        row_fills[row_idx] = new_fill
 
     # ========== 4. 保存结果 ==========
-    wb.save(output_path)
+    if len(df2) * file2_column_count <= STYLED_OUTPUT_MAX_CELLS:
+        _write_styled_result(file2_path, output_path, row_remarks, row_contents, row_fills)
+    else:
+        _print(f"⚠️ 文件2共 {len(df2)} 行，超过按原格式保存的规模（{STYLED_OUTPUT_MAX_CELLS} 个单元格），"
+               f"改为流式写出：结果只保留活动工作表的单元格值，原有样式、数字格式、列宽、合并单元格和其他工作表不会保留")
+        _write_streamed_result(file2_path, output_path, file2_column_count, row_remarks, row_contents, row_fills)
+
+    # 增量模式：保存本次文件2的标识索引
+    if index_path:
+        row_identities = df1["标识"].tolist()
+        records = [
+            (file2_ids[i],
+             row_identities[best_matches[i]] if best_matches[i] is not None else None,
+             highest_scores[i] if best_matches[i] is not None else None)
+            for i in range(len(file2_ids))
+        ]
+        save_identity_index(index_path, run_date, file2_path, records, file1_identities, match_settings)
+        _print(f"📒 标识索引已保存至: {os.path.abspath(index_path)}")
+
     elapsed_time = time.time() - start_time
     _print(f"✅ 处理完成! 耗时: {elapsed_time:.2f}秒")
     _print(f"结果已保存至: {os.path.abspath(output_path)}")
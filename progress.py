@@ -0,0 +1,134 @@
+import threading
+import time
+
+# 两次进度通知之间的最小间隔（秒），避免逐条通知拖慢界面
+PROGRESS_MIN_INTERVAL = 0.2
+
+
+class OperationCancelled(Exception):
+    """操作已被用户取消"""
+
+
+def format_duration(seconds):
+    """把秒数格式化为 时:分:秒（不足一小时时为 分:秒）"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class ProgressContext:
+    """
+    进度/取消上下文，由调用方创建后传给耗时操作
+
+    操作用 start(total, stage) 开始一个阶段，用 advance / update 报告已完成数；
+    总量事先未知时（边遍历边处理）用 add_total 逐步增加。通知按 min_interval 节流：
+    progress_callback(percent) 只在百分比变化时调用，status_callback(text) 接收
+    "阶段 已完成/总量 (百分比)，预计剩余 分:秒" 形式的文本。两个回调都可以为 None。
+    cancel() 可在任意线程调用，操作在循环中调用 check() 时抛出 OperationCancelled。
+    所有方法都是线程安全的。
+    """
+
+    def __init__(self, progress_callback=None, status_callback=None, min_interval=PROGRESS_MIN_INTERVAL):
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.min_interval = min_interval
+        self.stage = ""
+        self.total = 0
+        self.done = 0
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._start_time = time.monotonic()
+        self._last_emit = 0.0
+        self._last_percent = -1
+
+    def start(self, total, stage=""):
+        """开始一个阶段：设置总量并把已完成数归零"""
+        with self._lock:
+            self.stage = stage
+            self.total = total
+            self.done = 0
+            self._start_time = time.monotonic()
+        self._emit(force=True)
+
+    def add_total(self, count=1):
+        """增加当前阶段的总量"""
+        with self._lock:
+            self.total += count
+
+    def advance(self, count=1):
+        """已完成数增加 count"""
+        with self._lock:
+            self.done += count
+        self._emit()
+
+    def update(self, done):
+        """把已完成数设为 done"""
+        with self._lock:
+            self.done = done
+        self._emit()
+
+    def finish(self):
+        """当前阶段全部完成"""
+        with self._lock:
+            self.done = self.total
+        self._emit(force=True)
+
+    @property
+    def percent(self):
+        """当前阶段的完成百分比（0-100）"""
+        if not self.total:
+            return 0
+        return min(100, self.done * 100 // self.total)
+
+    def eta(self):
+        """按当前阶段的平均速度估算剩余秒数，尚无法估算时返回 None"""
+        if not self.done or not self.total:
+            return None
+        elapsed = time.monotonic() - self._start_time
+        return elapsed / self.done * max(self.total - self.done, 0)
+
+    def status_text(self):
+        """当前进度的文字描述"""
+        text = f"{self.stage} " if self.stage else ""
+        text += f"{self.done}/{self.total} ({self.percent}%)"
+        eta = self.eta()
+        if eta is not None and self.done < self.total:
+            text += f"，预计剩余 {format_duration(eta)}"
+        return text
+
+    def cancel(self):
+        """请求取消操作"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def check(self):
+        """已请求取消时抛出 OperationCancelled，供操作在循环中调用"""
+        if self._cancel_event.is_set():
+            raise OperationCancelled("操作已取消")
+
+    def _emit(self, force=False):
+        """按节流规则调用回调（回调在锁外执行）"""
+        if self.progress_callback is None and self.status_callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            percent = self.percent
+            # 到达100%时即使未到节流间隔也通知一次
+            reached_end = percent == 100 and self._last_percent != 100
+            if not force and not reached_end and now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+            percent_changed = percent != self._last_percent
+            self._last_percent = percent
+            text = self.status_text()
+        if percent_changed and self.progress_callback is not None:
+            self.progress_callback(percent)
+        if self.status_callback is not None:
+            self.status_callback(text)
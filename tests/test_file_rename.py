@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_rename import rename_files_by_template
+
+
+def test_template_keeps_original_name_when_mapped_value_is_empty(tmp_path):
+    source = tmp_path / "files"
+    source.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (source / name).write_text(name)
+    mapping_file = str(tmp_path / "mapping.xlsx")
+    pd.DataFrame({"原文件名": ["a.txt", "b.txt"], "新名称": ["报告甲", ""]}).to_excel(mapping_file, index=False)
+
+    messages = []
+    rename_files_by_template(str(source), "{excel:B}", mapping_file=mapping_file, output_callback=messages.append)
+
+    # 映射值为空的 b.txt 与映射表中没有的 c.txt 都保持原名，不会变成隐藏文件 ".txt"
+    assert sorted(path.name for path in source.glob("*.txt")) == ["b.txt", "c.txt", "报告甲.txt"]
+    assert any("2 个文件" in message for message in messages)
+
+
+def test_template_with_ext_keeps_original_name_when_stem_is_empty(tmp_path):
+    source = tmp_path / "files"
+    source.mkdir()
+    (source / "a.txt").write_text("a")
+
+    plan = rename_files_by_template(str(source), "{prefix}{ext}", dry_run=True, output_callback=lambda msg: None)
+
+    assert [entry["target"] for entry in plan] == [str(source / "a.txt")]
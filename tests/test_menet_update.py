@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from menet_update import load_identity_index, update_file_comparison
+
+
+def _write_file1(path, pairs):
+    """文件1：药物在第2列、企业在第5列、状态在第8列、内容在第24列"""
+    rows = [[str(i), drug, "", "", company, "", "", "审评中"] + [""] * 15 + ["内容"]
+            for i, (drug, company) in enumerate(pairs)]
+    pd.DataFrame(rows, columns=[f"c{i}" for i in range(24)]).to_excel(path, index=False)
+
+
+def _write_file2(path, pairs):
+    """文件2：药物在第1列、企业在第4列、状态在第7列"""
+    rows = [[drug, "", "", company, "", "", "审评中"] for drug, company in pairs]
+    pd.DataFrame(rows, columns=[f"c{i}" for i in range(7)]).to_excel(path, index=False)
+
+
+def test_one_to_one_with_index_keeps_matches_unique(tmp_path):
+    file1 = str(tmp_path / "file1.xlsx")
+    file2 = str(tmp_path / "file2.xlsx")
+    index_path = str(tmp_path / "index.sqlite")
+    company = "华北制药股份有限公司"
+    _write_file2(file2, [(f"阿莫西林胶囊{suffix}", company) for suffix in "甲乙丙"])
+
+    # 第一次运行：三条文件2记录各自分到一条文件1记录
+    _write_file1(file1, [(f"阿莫西林胶囊{suffix}", company) for suffix in "子丑寅"])
+    update_file_comparison(file1, file2, str(tmp_path / "out1.xlsx"), index_path=index_path,
+                           one_to_one=True, output_callback=lambda msg: None)
+
+    # 第二次运行：新增一条与三条记录都更相似的文件1记录，复用的结果不能同时占用它
+    _write_file1(file1, [(f"阿莫西林胶囊{suffix}", company) for suffix in "子丑寅"] + [("阿莫西林胶囊", company)])
+    update_file_comparison(file1, file2, str(tmp_path / "out2.xlsx"), index_path=index_path,
+                           one_to_one=True, output_callback=lambda msg: None)
+
+    _, stored, _, _ = load_identity_index(index_path)
+    matched = [match for match, _ in stored.values() if match is not None]
+    assert len(matched) == 3
+    assert len(set(matched)) == len(matched)
+    assert f"阿莫西林胶囊|{company}" in matched